@@ -0,0 +1,208 @@
+"""
+Aggregates: small precomputed per-country and per-year summary tables of main_df.
+
+For every country (and every year) the tables store the row count and, for each data column, the
+number of values, their sum, and their sum of squares. For every pair of data columns they store
+the same sums over the rows where both columns have values, along with the sum of products. The
+mean, variance, and correlation of any column(s) in a group come from these sums, skipping NA
+values like df.groupby(group).mean(), .var(), and .corr() do, so consumers read a table with one
+row per country instead of scanning main_df.
+
+The sums can be added to and subtracted from. When rows of main_df are added, changed, or
+removed, update_aggregates() adds the new rows' sums and subtracts the old rows' sums instead of
+rebuilding the tables.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    rebuild_aggregates()
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+AGGREGATE_GROUPS = ['code', 'year']
+AGGREGATE_FILES = {group: f'cleaned_datasets/main_df_aggregates_by_{group}.csv' for group in AGGREGATE_GROUPS}
+
+
+def _data_columns(df: pd.DataFrame) -> list[str]:
+    """Data columns of main_df, or the data columns summarized in an aggregate table"""
+    if 'count' in df.columns:
+        return [column[len('sum_'):] for column in df.columns if column.startswith('sum_')]
+    return [column for column in df.columns if column not in AGGREGATE_GROUPS + ['country']]
+
+
+def _count_column(column):
+    return f'count_{column}'
+
+
+def _sum_column(column):
+    return f'sum_{column}'
+
+
+def _sumsq_column(column):
+    return f'sumsq_{column}'
+
+
+def _sumprod_column(column_1, column_2):
+    return f'sumprod_{column_1}_x_{column_2}'
+
+
+def _pair_column(stat, column_1, column_2):
+    """Column for a stat over the rows where both columns have values, ex: pair_count_a_x_b"""
+    return f'pair_{stat}_{column_1}_x_{column_2}'
+
+
+def compute_aggregates(df: pd.DataFrame, group: str, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Compute the counts, sums, sums of squares, and sums of products of the data columns by group,
+    skipping NA values
+    Parameters:
+        df - dataframe like main_df
+        group - 'code' to aggregate by country, or 'year' to aggregate by year
+        columns - data columns to aggregate, every column except code, country, and year if None
+    Returns:
+        DataFrame indexed by group with a count column (number of rows) and the sum columns
+    """
+    if columns is None:
+        columns = _data_columns(df)
+    values = df[columns].to_numpy(dtype='float64')
+    has_value = ~np.isnan(values)
+    values = np.where(has_value, values, 0.0)
+    terms = {'count': np.ones(len(df))}
+    for i, column in enumerate(columns):
+        terms[_count_column(column)] = has_value[:, i].astype('float64')
+        terms[_sum_column(column)] = values[:, i]
+        terms[_sumsq_column(column)] = values[:, i] ** 2
+    for (i, column_1), (j, column_2) in itertools.combinations(enumerate(columns), 2):
+        # sums over the rows where both columns have values, for their correlation
+        both = has_value[:, i] & has_value[:, j]
+        values_1, values_2 = np.where(both, values[:, i], 0.0), np.where(both, values[:, j], 0.0)
+        terms[_pair_column('count', column_1, column_2)] = both.astype('float64')
+        terms[_pair_column('sum_1', column_1, column_2)] = values_1
+        terms[_pair_column('sum_2', column_1, column_2)] = values_2
+        terms[_pair_column('sumsq_1', column_1, column_2)] = values_1 ** 2
+        terms[_pair_column('sumsq_2', column_1, column_2)] = values_2 ** 2
+        terms[_sumprod_column(column_1, column_2)] = values_1 * values_2
+    terms = pd.DataFrame(terms, index=pd.Index(df[group].to_numpy(), name=group))
+    aggregates = terms.groupby(level=group).sum()
+    return _round_counts(aggregates)
+
+
+def _round_counts(aggregates: pd.DataFrame) -> pd.DataFrame:
+    count_columns = [column for column in aggregates.columns
+                     if column == 'count' or column.startswith(('count_', 'pair_count_'))]
+    aggregates[count_columns] = aggregates[count_columns].round().astype('int64')
+    return aggregates
+
+
+def rebuild_aggregates(df: pd.DataFrame = None, save: bool = True) -> dict[str, pd.DataFrame]:
+    """
+    Build the aggregate tables from scratch
+    Parameters:
+        df - main_df, read from cleaned_datasets if None
+        save - whether to save the tables in cleaned_datasets
+    Returns:
+        dict mapping 'code' and 'year' to their aggregate tables
+    """
+    if df is None:
+        df = pd.read_csv('cleaned_datasets/main_df.csv')
+    aggregates = {group: compute_aggregates(df, group) for group in AGGREGATE_GROUPS}
+    if save:
+        save_aggregates(aggregates)
+    return aggregates
+
+
+def load_aggregates() -> dict[str, pd.DataFrame]:
+    """Read the aggregate tables saved in cleaned_datasets"""
+    return {group: pd.read_csv(read_file, index_col=group) for group, read_file in AGGREGATE_FILES.items()}
+
+
+def save_aggregates(aggregates: dict[str, pd.DataFrame]):
+    for group, df in aggregates.items():
+        df.to_csv(AGGREGATE_FILES[group])
+
+
+def update_aggregates(old_rows: pd.DataFrame, new_rows: pd.DataFrame,
+                      aggregates: dict[str, pd.DataFrame] = None, save: bool = True) -> dict[str, pd.DataFrame]:
+    """
+    Update the aggregate tables for rows of main_df that were added, changed, or removed
+    Parameters:
+        old_rows - rows as they were in main_df before the change (removed rows and the old
+            versions of changed rows)
+        new_rows - rows as they are in main_df after the change (added rows and the new
+            versions of changed rows)
+        aggregates - aggregate tables to update, read from cleaned_datasets if None
+        save - whether to save the updated tables in cleaned_datasets
+    Returns:
+        dict mapping 'code' and 'year' to their updated aggregate tables
+    """
+    if aggregates is None:
+        aggregates = load_aggregates()
+    updated = {}
+    for group, table in aggregates.items():
+        delta = compute_aggregates(new_rows, group).sub(compute_aggregates(old_rows, group), fill_value=0)
+        table = _round_counts(table.add(delta, fill_value=0))
+        # drop the groups that no longer have any rows
+        table = table[table['count'] > 0]
+        updated[group] = table.sort_index()
+    if save:
+        save_aggregates(updated)
+    return updated
+
+
+def get_means(aggregates: pd.DataFrame, columns: list[str] = None) -> pd.DataFrame:
+    """Mean of each data column by group, like df.groupby(group).mean()"""
+    if columns is None:
+        columns = _data_columns(aggregates)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({column: aggregates[_sum_column(column)] / aggregates[_count_column(column)]
+                             for column in columns})
+
+
+def get_variances(aggregates: pd.DataFrame, columns: list[str] = None) -> pd.DataFrame:
+    """Sample variance of each data column by group, like df.groupby(group).var()"""
+    if columns is None:
+        columns = _data_columns(aggregates)
+    variances = {}
+    for column in columns:
+        count = aggregates[_count_column(column)]
+        sums = aggregates[_sum_column(column)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (aggregates[_sumsq_column(column)] - sums ** 2 / count) / (count - 1)
+        # rounding can leave tiny negative values for columns that don't vary
+        variances[column] = variance.clip(lower=0).where(count > 1)
+    return pd.DataFrame(variances)
+
+
+def get_correlations(aggregates: pd.DataFrame, column_1: str, column_2: str) -> pd.Series:
+    """Pearson correlation between two data columns by group, like x[column_1].corr(x[column_2])"""
+    if column_1 == column_2:
+        return pd.Series(1.0, index=aggregates.index)
+    # the pair columns are stored in the order the data columns are in
+    columns = [column for column in _data_columns(aggregates) if column in (column_1, column_2)]
+    first, second = ('1', '2') if columns[0] == column_1 else ('2', '1')
+    count = aggregates[_pair_column('count', *columns)]
+    sum_1 = aggregates[_pair_column(f'sum_{first}', *columns)]
+    sum_2 = aggregates[_pair_column(f'sum_{second}', *columns)]
+    sumsq_1 = aggregates[_pair_column(f'sumsq_{first}', *columns)]
+    sumsq_2 = aggregates[_pair_column(f'sumsq_{second}', *columns)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = aggregates[_sumprod_column(*columns)] - sum_1 * sum_2 / count
+        variance_1 = sumsq_1 - sum_1 ** 2 / count
+        variance_2 = sumsq_2 - sum_2 ** 2 / count
+        correlation = covariance / np.sqrt(variance_1 * variance_2)
+    return correlation.where((count > 1) & (variance_1 > 0) & (variance_2 > 0))
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,136 @@
+"""
+Gap filling: an alternative to main_df that outer merges the datasets and fills in missing years.
+
+The inner merge in merge.py drops a (country, year) whenever any one dataset is missing it. Here the
+datasets are outer merged and each indicator is filled in within each country, either by linear
+interpolation between the surrounding years or by carrying the last year forward. A limit caps how
+many missing years in a row can be filled, and a <column>_imputed flag column marks every filled value.
+
+All countries and indicators are filled at once as a (country, year, indicator) numpy array
+instead of looping over the countries in Python.
+"""
+import numpy as np
+import pandas as pd
+from merge import merge_data, drop_bad_countries_from_merged, MERGED_COLUMN_AGGREGATIONS
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    gap_filled_df = build_gap_filled_panel()
+    gap_filled_df.to_csv('cleaned_datasets/gap_filled_main_df.csv', index=False)
+    print(gap_filled_df)
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+GAP_FILL_METHODS = ['interpolate', 'ffill']
+
+
+def to_panel_array(df: pd.DataFrame, value_columns: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Turn a dataframe with one row per (code, year) into a (country, year, indicator) array
+    Parameters:
+        df - dataframe with code, year, and value_columns
+        value_columns - columns to put in the array, in order
+    Returns:
+        - array of shape (number of countries, number of years, number of value columns), with NA
+          values for the (code, year) pairs missing from df
+        - array of the sorted country codes
+        - array of every year from the first to the last year in df
+    """
+    codes, code_idx = np.unique(df['code'].to_numpy(), return_inverse=True)
+    year_values = df['year'].to_numpy()
+    years = np.arange(year_values.min(), year_values.max() + 1)
+    panel = np.full((len(codes), len(years), len(value_columns)), np.nan)
+    panel[code_idx, year_values - years[0]] = df[value_columns].to_numpy(dtype='float64')
+    return panel, codes, years
+
+
+def from_panel_array(panel: np.ndarray, codes: np.ndarray, years: np.ndarray,
+                     value_columns: list[str]) -> pd.DataFrame:
+    """Turn a (country, year, indicator) array back into a dataframe with one row per (code, year)"""
+    df = pd.DataFrame({'code': np.repeat(codes, len(years)), 'year': np.tile(years, len(codes))})
+    values = panel.reshape(len(codes) * len(years), len(value_columns))
+    df[value_columns] = values
+    return df
+
+
+def fill_gaps(panel: np.ndarray, method: str = 'interpolate', limit: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fill in the NA values of every indicator within every country, along the year axis
+    Parameters:
+        panel - (country, year, indicator) array, such as the one from to_panel_array()
+        method - 'interpolate' to fill gaps between two known years linearly, or 'ffill'
+            to carry the last known year forward
+        limit - maximum number of missing years in a row that can be filled
+            - for 'interpolate', gaps longer than limit are left as they are
+            - for 'ffill', only the first limit years after a known year are filled
+    Returns:
+        - filled array
+        - boolean array of the same shape, True for every filled value
+    """
+    if method not in GAP_FILL_METHODS:
+        raise ValueError(f"method must be one of {GAP_FILL_METHODS}, not '{method}'")
+    known = ~np.isnan(panel)
+    num_years = panel.shape[1]
+    year_idx = np.arange(num_years).reshape(1, num_years, 1)
+    # index of the closest known year at or before each year (-1 if there isn't one)
+    prev_idx = np.maximum.accumulate(np.where(known, year_idx, -1), axis=1)
+    prev_values = np.take_along_axis(panel, np.maximum(prev_idx, 0), axis=1)
+
+    if method == 'ffill':
+        fill = ~known & (prev_idx >= 0) & (year_idx - prev_idx <= limit)
+        filled_values = prev_values
+    else:
+        # index of the closest known year at or after each year (num_years if there isn't one)
+        next_idx = np.minimum.accumulate(np.where(known, year_idx, num_years)[:, ::-1], axis=1)[:, ::-1]
+        next_values = np.take_along_axis(panel, np.minimum(next_idx, num_years - 1), axis=1)
+        fill = ~known & (prev_idx >= 0) & (next_idx < num_years) & (next_idx - prev_idx - 1 <= limit)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = (year_idx - prev_idx) / (next_idx - prev_idx)
+        filled_values = prev_values + (next_values - prev_values) * weight
+
+    filled = np.where(fill, filled_values, panel)
+    return filled, fill
+
+
+def build_gap_filled_panel(datasets: dict[str, pd.DataFrame] = None, method: str = 'interpolate',
+                           limit: int = 2, min_years_threshold: int = 10,
+                           drop_incomplete: bool = True) -> pd.DataFrame:
+    """
+    Outer merge the datasets, fill in missing years, and drop countries without enough years of data
+    Parameters:
+        datasets - cleaned datasets to merge (see merge_data()), read from cleaned_datasets if None
+        method, limit - how to fill missing values (see fill_gaps())
+        min_years_threshold - countries with fewer complete years (no NA values after filling) are dropped
+        drop_incomplete - whether to drop the (code, year) rows that still have NA values after filling
+    Returns:
+        DataFrame like main_df, with an extra <column>_imputed column for each data column
+    """
+    value_columns = list(MERGED_COLUMN_AGGREGATIONS)
+    outer_merged = merge_data(datasets, how='outer')
+    panel, codes, years = to_panel_array(outer_merged, value_columns)
+    filled, imputed = fill_gaps(panel, method=method, limit=limit)
+
+    df = from_panel_array(filled, codes, years, value_columns)
+    imputed_columns = [f'{column}_imputed' for column in value_columns]
+    df[imputed_columns] = imputed.reshape(len(df), len(value_columns))
+    complete_df = df.dropna(subset=value_columns)
+    # only complete years count towards min_years_threshold, even when incomplete rows are kept
+    complete_df = drop_bad_countries_from_merged(complete_df.reset_index(drop=True), min_years_threshold)
+    if drop_incomplete:
+        return complete_df
+    # don't add rows for the years of a country that have no data at all
+    df = df.dropna(subset=value_columns, how='all')
+    df = df[df['code'].isin(complete_df['code'].unique())]
+    df = df.reset_index(drop=True)
+    return df
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,170 @@
+"""
+Indicators: split OECD exports that hold several measures into one tidy dataset per indicator.
+
+Each indicator is declared in INDICATOR_SPECS by the raw file it comes from, the dimension values
+that select its rows, and the column holding its values. Every raw file is read only once, keeping
+just the columns the specs need. The rows are grouped on their combination of filtered dimension
+values in one vectorized pass. Each indicator then takes the rows of the groups matching its
+filters, so adding an indicator doesn't add another scan of the file.
+
+The datasets are saved in cleaned_datasets in the same code, country, year, value format as tidy().
+"""
+import numpy as np
+import pandas as pd
+from key_stats import record_key_stats
+from tidy import sort_by_country_and_year
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    datasets = split_indicators()
+    for indicator, df in datasets.items():
+        print(indicator, df.shape)
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+ICU_BEDS_FILE = "original_datasets/ICU_beds.csv"
+PATIENT_EXPERIENCES_FILE = "original_datasets/patient_experiences.csv"
+
+# indicator name -> spec:
+#   - read_file: raw OECD export the indicator comes from
+#   - filters: dict mapping dimension columns to the value (or list of values) to keep
+#   - value_column (optional): column holding the values, 'OBS_VALUE' by default
+INDICATOR_SPECS = {
+    'adult_icu_beds_p_100k_ppl': {
+        'read_file': ICU_BEDS_FILE,
+        'filters': {'MEASURE': 'HBU_ICU_A', 'UNIT_MEASURE': '10P5HB', 'STATISTICAL_OPERATION': 'MEAN'}
+    },
+    'icu_beds_p_100k_ppl': {
+        'read_file': ICU_BEDS_FILE,
+        'filters': {'MEASURE': 'HBU_ICU', 'UNIT_MEASURE': '10P5HB', 'STATISTICAL_OPERATION': 'MEAN'}
+    },
+    'adult_critical_care_beds_p_100k_ppl': {
+        'read_file': ICU_BEDS_FILE,
+        'filters': {'MEASURE': 'HBU_CC_A', 'UNIT_MEASURE': '10P5HB', 'STATISTICAL_OPERATION': 'MEAN'}
+    },
+    'days_adult_icu_occupancy_over_95_perc': {
+        'read_file': ICU_BEDS_FILE,
+        'filters': {'MEASURE': 'HBO_ICU_A_GT95'}
+    },
+    # patient experiences: weighted values for both sexes, not the confidence interval bounds
+    'consultation_skipped_due_to_costs': {
+        'read_file': PATIENT_EXPERIENCES_FILE,
+        'filters': {'MEASURE': 'COSKCOST', 'SEX': '_T', 'STATISTICAL_OPERATION': 'VALUEW'}
+    },
+    'medical_tests_skipped_due_to_costs': {
+        'read_file': PATIENT_EXPERIENCES_FILE,
+        'filters': {'MEASURE': 'MTSKCOST', 'SEX': '_T', 'STATISTICAL_OPERATION': 'VALUEW'}
+    },
+    'prescribed_medicines_skipped_due_to_costs': {
+        'read_file': PATIENT_EXPERIENCES_FILE,
+        'filters': {'MEASURE': 'PMSKCOST', 'SEX': '_T', 'STATISTICAL_OPERATION': 'VALUEW'}
+    },
+    'regular_doctor_spending_enough_time': {
+        'read_file': PATIENT_EXPERIENCES_FILE,
+        'filters': {'MEASURE': 'RHPTIPAT', 'SEX': '_T', 'STATISTICAL_OPERATION': 'VALUEW'}
+    },
+    'regular_doctor_involving_patients_in_decisions': {
+        'read_file': PATIENT_EXPERIENCES_FILE,
+        'filters': {'MEASURE': 'RHPIPDEC', 'SEX': '_T', 'STATISTICAL_OPERATION': 'VALUEW'}
+    },
+}
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def split_source(df: pd.DataFrame, specs: dict[str, dict], min_year: int = 2000,
+                 max_year: int = 2019, og_country_column: str = "Reference area",
+                 og_country_code_column: str = "REF_AREA",
+                 og_year_column: str = "TIME_PERIOD") -> dict[str, pd.DataFrame]:
+    """
+    Route the rows of one raw dataframe into a tidy dataframe for each indicator spec
+    Parameters:
+        df - raw dataframe that every spec reads from
+        specs - dict mapping indicator names to specs (see INDICATOR_SPECS)
+        min_year, max_year - inclusive range of years to keep
+        og_country_column, og_country_code_column, og_year_column - raw country, code, and year columns
+    Returns:
+        dict mapping each indicator name to a dataframe with code, country, year, and indicator columns
+    """
+    # drop the years out of the time frame once, for every indicator
+    df = df[(df[og_year_column] >= min_year) & (df[og_year_column] <= max_year)]
+    filter_columns = sorted({col for spec in specs.values() for col in spec['filters']})
+    # one pass over the rows: number each combination of filter values, then sort the rows by it
+    group_ids, groups = pd.MultiIndex.from_frame(df[filter_columns].astype(str)).factorize()
+    row_order = np.argsort(group_ids, kind='stable')
+    group_sizes = np.bincount(group_ids, minlength=len(groups))
+    group_ends = np.cumsum(group_sizes)
+    group_starts = group_ends - group_sizes
+    groups = pd.DataFrame(groups.tolist(), columns=filter_columns)
+
+    datasets = {}
+    for indicator, spec in specs.items():
+        # match the filters against the (few) unique combinations instead of every row
+        matches = np.ones(len(groups), dtype=bool)
+        for col, values in spec['filters'].items():
+            matches &= groups[col].isin([str(value) for value in _as_list(values)]).to_numpy()
+        rows = np.concatenate([row_order[group_starts[group]:group_ends[group]]
+                               for group in np.flatnonzero(matches)] + [np.array([], dtype=np.int64)])
+        rows.sort()
+        selected = df.iloc[rows]
+        indicator_df = pd.DataFrame({
+            'code': selected[og_country_code_column].to_numpy(),
+            'country': selected[og_country_column].to_numpy(),
+            'year': selected[og_year_column].to_numpy(),
+            indicator: pd.to_numeric(selected[spec.get('value_column', 'OBS_VALUE')]).to_numpy()
+        })
+        indicator_df = sort_by_country_and_year(indicator_df).reset_index(drop=True)
+        datasets[indicator] = indicator_df
+    return datasets
+
+
+def split_indicators(specs: dict[str, dict] = None, min_year: int = 2000, max_year: int = 2019,
+                     og_country_column: str = "Reference area", og_country_code_column: str = "REF_AREA",
+                     og_year_column: str = "TIME_PERIOD", save: bool = True) -> dict[str, pd.DataFrame]:
+    """
+    Read each raw file in the specs once and split it into a tidy dataframe for each of its indicators
+    Parameters:
+        specs - dict mapping indicator names to specs, INDICATOR_SPECS if None
+        min_year, max_year - inclusive range of years to keep
+        og_country_column, og_country_code_column, og_year_column - raw country, code, and year columns
+        save - whether to save each indicator's dataframe as cleaned_datasets/<indicator>.csv
+    Returns:
+        dict mapping each indicator name to its tidy dataframe
+    """
+    if specs is None:
+        specs = INDICATOR_SPECS
+    specs_by_file = {}
+    for indicator, spec in specs.items():
+        specs_by_file.setdefault(spec['read_file'], {})[indicator] = spec
+
+    datasets = {}
+    for read_file, file_specs in specs_by_file.items():
+        # only parse the columns that some spec needs
+        use_columns = {og_country_code_column, og_country_column, og_year_column}
+        for spec in file_specs.values():
+            use_columns.update(spec['filters'])
+            use_columns.add(spec.get('value_column', 'OBS_VALUE'))
+        df = pd.read_csv(read_file, usecols=list(use_columns))
+        datasets.update(split_source(df, file_specs, min_year=min_year, max_year=max_year,
+                                     og_country_column=og_country_column,
+                                     og_country_code_column=og_country_code_column,
+                                     og_year_column=og_year_column))
+
+    if save:
+        for indicator, df in datasets.items():
+            df.to_csv(f'cleaned_datasets/{indicator}.csv', index=False)
+            record_key_stats(indicator, df)
+    return datasets
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,150 @@
+"""
+Key stats: check how many rows each (code, year) key has before datasets get merged.
+
+Several cleaned datasets have many rows per (code, year), and merging two of them makes a row for
+every pair of their rows. Whenever a cleaned dataset is saved, the number of rows of each key is
+saved to informational_datasets/key_counts/<dataset>.csv, and a summary of them to
+informational_datasets/key_stats.csv. The per-key counts give the exact size of a merge on those
+keys without running it, along with the size of every merge along the way when several datasets
+are merged one after another. merge_data() reads the saved counts for the datasets in
+cleaned_datasets (and counts the keys itself for dataframes passed to it) to fail fast or aggregate
+first when any of its merges would fan out past MAX_MERGE_FANOUT.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+KEY_COLUMNS = ['code', 'year']
+KEY_STATS_FILE = 'informational_datasets/key_stats.csv'
+KEY_COUNTS_DIR = 'informational_datasets/key_counts'
+# largest allowed ratio of rows in any merge step to rows in the biggest dataset being merged
+MAX_MERGE_FANOUT = 10.0
+
+
+def key_counts(df: pd.DataFrame, key_columns: list[str] = None) -> pd.Series:
+    """Number of rows of df for each key"""
+    if key_columns is None:
+        key_columns = KEY_COLUMNS
+    return df.groupby(key_columns, sort=False).size()
+
+
+def key_counts_file(df_title: str) -> str:
+    return f'{KEY_COUNTS_DIR}/{df_title}.csv'
+
+
+def compute_key_stats(df: pd.DataFrame, key_columns: list[str] = None, counts: pd.Series = None) -> dict:
+    """
+    Compute how many rows the keys of a dataframe have
+    Parameters:
+        df - tidy dataframe
+        key_columns - columns that should identify a row, ['code', 'year'] if None
+        counts - key_counts() of df, computed if None
+    Returns:
+        dict with the number of rows, distinct keys, keys with more than one row, and the
+        mean and max rows per key
+    """
+    if counts is None:
+        counts = key_counts(df, key_columns)
+    return {
+        'rows': len(df),
+        'distinct_keys': len(counts),
+        'duplicated_keys': int((counts > 1).sum()),
+        'mean_rows_per_key': float(counts.mean()) if len(counts) else 0.0,
+        'max_rows_per_key': int(counts.max()) if len(counts) else 0
+    }
+
+
+def hash_keys(df: pd.DataFrame, key_columns: list[str] = None) -> str:
+    """Hash of the keys of df that doesn't depend on the order of its rows"""
+    if key_columns is None:
+        key_columns = KEY_COLUMNS
+    row_hashes = pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+    # summing wraps around, which keeps the hash the same for any order of the rows
+    return f'{row_hashes.sum(dtype=np.uint64):016x}'
+
+
+def _read_key_stats() -> pd.DataFrame:
+    return pd.read_csv(KEY_STATS_FILE, dtype={'key_hash': str})
+
+
+def record_key_stats(df_title: str, df: pd.DataFrame, key_columns: list[str] = None):
+    """
+    Save the number of rows of each key of a cleaned dataset to KEY_COUNTS_DIR, and a summary of
+    them to KEY_STATS_FILE, replacing any earlier ones for it
+    Parameters:
+        df_title - name the dataset is saved under in cleaned_datasets
+        df - the cleaned dataframe, as saved
+        key_columns - columns that should identify a row, ['code', 'year'] if None
+    """
+    counts = key_counts(df, key_columns)
+    os.makedirs(KEY_COUNTS_DIR, exist_ok=True)
+    counts.rename('rows').to_csv(key_counts_file(df_title))
+    row = pd.DataFrame([{'dataset': df_title, **compute_key_stats(df, counts=counts),
+                         'key_hash': hash_keys(df, key_columns)}])
+    if os.path.exists(KEY_STATS_FILE):
+        recorded = _read_key_stats()
+        row = pd.concat([recorded[recorded['dataset'] != df_title], row], ignore_index=True)
+    row.to_csv(KEY_STATS_FILE, index=False)
+
+
+def load_key_counts(df_title: str, df: pd.DataFrame, key_columns: list[str] = None) -> pd.Series:
+    """
+    Get the number of rows of each key of a cleaned dataset from its saved counts, counting them
+    from df instead if they were never saved or were saved for different keys than the keys of df
+    """
+    if key_columns is None:
+        key_columns = KEY_COLUMNS
+    read_file = key_counts_file(df_title)
+    if os.path.exists(read_file) and os.path.exists(KEY_STATS_FILE):
+        recorded = _read_key_stats().set_index('dataset')
+        if df_title in recorded.index and recorded.loc[df_title, 'key_hash'] == hash_keys(df, key_columns):
+            return pd.read_csv(read_file, index_col=key_columns)['rows']
+    return key_counts(df, key_columns)
+
+
+def estimate_merge_size(counts: list[pd.Series], how: str = 'inner') -> tuple[int, int]:
+    """
+    Compute the number of rows that merging several dataframes one after another on the same
+    key would make
+    Parameters:
+        counts - key_counts() of each dataframe, in merge order
+        how - 'inner' or 'outer'
+    Returns:
+        - number of rows of the biggest result of any of the merges along the way, which is what
+          memory use peaks at (an inner merge can shrink back down once a later dataset is merged)
+        - number of rows of the final merged dataframe
+    """
+    merged_counts = counts[0]
+    peak = int(merged_counts.sum())
+    for other_counts in counts[1:]:
+        if how == 'inner':
+            # a key in both makes a row for every pair of rows, a key missing from either makes none
+            merged_counts = merged_counts.mul(other_counts, fill_value=0)
+        else:
+            # a key missing from one side keeps the other side's rows as they are
+            merged_counts = merged_counts.mul(other_counts, fill_value=1)
+        peak = max(peak, int(merged_counts.sum()))
+    return peak, int(merged_counts.sum())
+
+
+def merge_fanout(datasets: list[pd.DataFrame], how: str = 'inner', key_columns: list[str] = None,
+                 counts: list[pd.Series] = None) -> tuple[int, float]:
+    """
+    Compute the peak size of merging datasets one after another, and how much bigger it is than
+    the biggest dataset being merged
+    Parameters:
+        datasets - dataframes being merged, in merge order
+        how - 'inner' or 'outer'
+        key_columns - columns the dataframes are merged on, ['code', 'year'] if None
+        counts - key_counts() of each dataframe (ex: from load_key_counts()), computed if None
+    Returns:
+        - number of rows of the biggest result of any of the merges along the way
+        - ratio of that number to the number of rows of the biggest dataset
+    """
+    if counts is None:
+        counts = [key_counts(df, key_columns) for df in datasets]
+    peak, _ = estimate_merge_size(counts, how)
+    largest = max(len(df) for df in datasets)
+    return peak, peak / max(largest, 1)
@@ -0,0 +1,133 @@
+"""
+Merging: combine the cleaned datasets into one dataframe with one row per (country, year).
+The cleaned datasets must already be saved in cleaned_datasets (see preprocess_data.py).
+
+Steps:
+ - inner merge all the datasets on (code, year)
+    - if any of the merges along the way would fan out past MAX_MERGE_FANOUT times the biggest
+      dataset (see key_stats.py), each dataset is aggregated to one row per (code, year) first
+ - aggregate datasets that have several rows per (code, year) by their mean
+ - drop countries that don't have enough years of data, saving the result as main_df
+ - build the per-country and per-year aggregate tables of main_df (see aggregates.py)
+"""
+import os
+
+import pandas as pd
+from aggregates import rebuild_aggregates
+from key_stats import load_key_counts, merge_fanout, MAX_MERGE_FANOUT
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    inner_final = merge_data()
+    inner_final.to_csv('cleaned_datasets/inner_merged.csv', index=False)
+    main_df = drop_bad_countries_from_merged(inner_final)
+    main_df.to_csv('cleaned_datasets/main_df.csv', index=False)
+    rebuild_aggregates(main_df)
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+# cleaned csv file for each dataset in the merge, in the order they get merged
+MERGED_DATASET_FILES = {
+    'expenditure_per_capita': 'cleaned_datasets/healthcare_expenditure_worldbank.csv',
+    'life_expectancy': 'cleaned_datasets/life_expectancy.csv',
+    'avoidable_deaths': 'cleaned_datasets/avoidable_mortality.csv',
+    'hospital_stay_length': 'cleaned_datasets/hospital_stay_length.csv',
+    'health_expenditure_as_percent_gdp': 'cleaned_datasets/filtered_health_expenditure_as_percent_gdp.csv',
+    'med_tech_availability_p_mil_ppl': 'cleaned_datasets/medical_tech_availability.csv',
+}
+
+# how each data column is aggregated into a single value per (country, year)
+# hospital length stay and med tech availability have several rows per (country, year)
+MERGED_COLUMN_AGGREGATIONS = {
+    'hospital_stay_length': 'mean',
+    'med_tech_availability_p_mil_ppl': 'mean',
+    'expenditure_per_capita': 'first',
+    'life_expectancy': 'first',
+    'avoidable_deaths': 'first',
+    'health_expenditure_as_percent_gdp': 'first'
+}
+
+
+def merge_data(datasets: dict[str, pd.DataFrame] = None, how: str = 'inner',
+               max_fanout: float = MAX_MERGE_FANOUT, on_fanout: str = 'aggregate') -> pd.DataFrame:
+    """
+    Merge the datasets on (code, year), aggregating to one row per (code, year)
+    Parameters:
+        datasets - dict mapping each data column in MERGED_DATASET_FILES to its cleaned dataframe
+            - if None, the datasets are read from cleaned_datasets, along with their saved key counts
+        how - 'inner' to only keep (code, year) pairs found in every dataset, or 'outer' to keep
+            pairs found in any dataset, leaving NA values for the datasets missing them
+        max_fanout - largest allowed ratio of rows in any of the merges along the way to rows in
+            the biggest dataset
+        on_fanout - what to do when the merge would pass max_fanout, estimated without running it:
+            - 'aggregate' to aggregate each dataset to one row per (code, year) before merging
+              (this gives the same result, since every pair of rows gets the same weight)
+            - 'raise' to raise a ValueError
+    Returns:
+        merged DataFrame with code, year, and one column per dataset
+    """
+    if how not in ['inner', 'outer']:
+        raise ValueError(f"how must be 'inner' or 'outer', not '{how}'")
+    if on_fanout not in ['aggregate', 'raise']:
+        raise ValueError(f"on_fanout must be 'aggregate' or 'raise', not '{on_fanout}'")
+    counts = None
+    if datasets is None:
+        datasets = {column: pd.read_csv(read_file)
+                    for column, read_file in MERGED_DATASET_FILES.items()}
+        # use the key counts saved when the datasets were cleaned instead of counting them again
+        counts = [load_key_counts(os.path.splitext(os.path.basename(read_file))[0], datasets[column])
+                  for column, read_file in MERGED_DATASET_FILES.items()]
+    datasets = [datasets[column][['code', 'year', column]] for column in MERGED_DATASET_FILES]
+
+    # always aggregate first for outer merges so rows missing from some datasets aren't multiplied
+    pre_aggregate = how == 'outer'
+    if not pre_aggregate:
+        peak, fanout = merge_fanout(datasets, how, counts=counts)
+        if fanout > max_fanout:
+            if on_fanout == 'raise':
+                raise ValueError(f"merging would make up to {peak} rows, {fanout:.1f} times the biggest dataset "
+                                 f"(max_fanout is {max_fanout}), aggregate the datasets by (code, year) first")
+            pre_aggregate = True
+
+    # merge all the necessary datasets by (country, year)
+    merged = None
+    for df in datasets:
+        if pre_aggregate:
+            column = df.columns[-1]
+            df = df.groupby(['code', 'year'], as_index=False, sort=False).agg(
+                {column: MERGED_COLUMN_AGGREGATIONS[column]})
+        if merged is None:
+            merged = df
+        else:
+            merged = merged.merge(df, on=['code', 'year'], how=how)
+
+    # aggregate the datasets with several rows per (country, year)
+    aggregated = merged.groupby(['code', 'year'], as_index=True).agg(
+        MERGED_COLUMN_AGGREGATIONS)
+    merged_final = aggregated.reset_index()
+    return merged_final
+
+
+def drop_bad_countries_from_merged(merged_df: pd.DataFrame, min_years_threshold: int = 10,
+                                   verbose: bool = True) -> pd.DataFrame:
+    """ Drop countries from a dataframe that have less than min_years_threshold years of data.
+    """
+    years_per_country = merged_df.groupby('code')['year'].size()
+    bad_codes = years_per_country[years_per_country < min_years_threshold].index.to_list()
+    if verbose:
+        print("bad countries are:", bad_codes)
+    # get the merged dataframe only on countries that have at least min_years_threshold years of data
+    merged_df = merged_df[~merged_df['code'].isin(bad_codes)]
+    merged_df = merged_df.reset_index(drop=True)
+    return merged_df
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -6,6 +6,7 @@ Here is where everyone will be writing code for their individual datasets.
 
 import pandas as pd
 from analysis import analyze
+from key_stats import record_key_stats
 from tidy import tidy
 
 
@@ -29,16 +30,74 @@ def run():
 # FUNCTION DEFINITIONS - no need to comment out
 # =============================================
 
+# columns dropped while tidying the datasets that get merged into main_df
+# (most of these are duplicate short-version columns)
+MEDICAL_TECH_DROP_COLS = [
+    'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION', 'MEASURE', 'UNIT_MEASURE',
+    'STATISTICAL_OPERATION', 'OWNERSHIP_TYPE', 'HEALTH_FUNCTION', 'CARE_TYPE',
+    'HEALTH_CARE_PROVIDER', 'Time period', 'Observation value', 'DECIMALS', 'Decimals',
+    'OBS_STATUS', 'OBS_STATUS2', 'OBS_STATUS3', 'UNIT_MULT', 'REF_YEAR_PRICE'
+]
+EXPENDITURE_P_GDP_DROP_COLS = [
+    'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION', 'MEASURE', 'UNIT_MEASURE', 'FREQ',
+    'FINANCING_SCHEME', 'PRICE_BASE', 'CURRENCY', 'BASE_PER', 'FUNCTION', 'MODE_PROVISION',
+    'FACTOR_PROVISION', 'ASSET_TYPE', 'Time period', 'Observation value', 'DECIMALS',
+    'Decimals', 'OBS_STATUS', 'OBS_STATUS2', 'OBS_STATUS3', 'Unit multiplier', 'UNIT_MULT',
+    'MODE_PROVISION'
+]
+AVOIDABLE_MORTALITY_DROP_COLS = [
+    "STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION", "FREQ", "MEASURE",
+    "UNIT_MEASURE", "Time period", "Observation value", "UNIT_MULT",
+    "DECIMALS", "Decimals", "AGE", "SOCIO_ECON_STATUS", "DEATH_CAUSE",
+    "CALC_METHODOLOGY", "GESTATION_THRESHOLD", "HEALTH_STATUS", "DISEASE",
+    "CANCER_SITE", "Observation value", "OBS_STATUS2", "SEX",
+    "OBS_STATUS3"
+]
+HOSPITAL_STAY_DROP_COLS = [
+    "STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION", "MEASURE",
+    "UNIT_MEASURE", "Time period", "Observation value", "UNIT_MULT",
+    "DECIMALS", "Decimals", "AGE", "DISEASE", "DIAGNOSTIC_TYPE", "PROVIDER",
+    "CANCER_SITE", "Observation value", "OBS_STATUS2", "SEX", "FUNCTION",
+    "MODE_PROVISION", "CARE_TYPE", "HEALTH_FACILITY", "WAITING_TIME",
+    "CONSULTATION_TYPE", "OBS_STATUS", "OBS_STATUS2", "OBS_STATUS3",
+    "MEDICAL_PROCEDURE", "OCCUPATION"
+]
+
+# how to read and clean the raw file for each data column in the merge
+RAW_SOURCES = {
+    'expenditure_per_capita': {
+        'read_file': 'original_datasets/healthcare_expenditure_worldbank.csv',
+        'worldbank': True
+    },
+    'life_expectancy': {
+        'read_file': 'original_datasets/life_expectancy.csv',
+        'worldbank': True
+    },
+    'avoidable_deaths': {
+        'read_file': 'original_datasets/avoidable_mortality.csv',
+        'drop_columns': AVOIDABLE_MORTALITY_DROP_COLS
+    },
+    'hospital_stay_length': {
+        'read_file': 'original_datasets/hospital_stay_length.csv',
+        'drop_columns': HOSPITAL_STAY_DROP_COLS
+    },
+    'health_expenditure_as_percent_gdp': {
+        'read_file': 'original_datasets/filtered_health_expenditure_as_percent_gdp.csv',
+        # see health_expenditure_as_percent_of_gdp()
+        'read_kwargs': {'dtype': {i: object for i in range(38, 42)}},
+        'drop_columns': EXPENDITURE_P_GDP_DROP_COLS
+    },
+    'med_tech_availability_p_mil_ppl': {
+        'read_file': 'original_datasets/medical_tech_availability.csv',
+        'drop_columns': MEDICAL_TECH_DROP_COLS
+    },
+}
+
+
 def medical_tech_availability():
     read_file = "original_datasets/medical_tech_availability.csv"
     df = pd.read_csv(read_file)
-    # most of these are duplicate short-version columns
-    unnecessary_cols = [
-        'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION', 'MEASURE', 'UNIT_MEASURE',
-        'STATISTICAL_OPERATION', 'OWNERSHIP_TYPE', 'HEALTH_FUNCTION', 'CARE_TYPE',
-        'HEALTH_CARE_PROVIDER', 'Time period', 'Observation value', 'DECIMALS', 'Decimals',
-        'OBS_STATUS', 'OBS_STATUS2', 'OBS_STATUS3', 'UNIT_MULT', 'REF_YEAR_PRICE'
-    ]
+    unnecessary_cols = MEDICAL_TECH_DROP_COLS
     data_cols_rename_dict = {
         'OBS_VALUE': 'med_tech_availability_p_mil_ppl'
     }
@@ -49,55 +108,53 @@ def medical_tech_availability():
     print("Dataframe:", df, sep="\n")
 
 
-def healthcare_expenditure_worldbank():
-    df = pd.read_csv("original_datasets/healthcare_expenditure_worldbank.csv")
+def clean_worldbank(df: pd.DataFrame, value_name: str,
+                    min_year: int = 2000, max_year: int = 2019) -> pd.DataFrame:
+    """
+    Turn a raw World Bank export (one column per year) into a tidy dataframe
+    Parameters:
+        df - raw dataframe as read from original_datasets (header on the 4th row)
+        value_name - name of the data column in the tidy dataframe
+        min_year, max_year - inclusive range of years to keep
+    Returns:
+        tidy DataFrame with country, code, year, and value_name columns
+    """
     df = df.rename(columns=df.iloc[3]).iloc[4:]
-    #drop columns not needed and only years from 2000 to 2019
+    #drop columns not needed and only years from min_year to max_year
     columns_to_keep = ['Country Name', 'Country Code'] + \
-                  [col for col in df.columns if isinstance(col, float) and col >= 2000.0 and col<=2019]
+                  [col for col in df.columns if isinstance(col, float) and col >= min_year and col <= max_year]
     df_filtered = df[columns_to_keep]
-    
+
     #change the orientation of the dataframe and add years as observations instead of variables
-    df_long = pd.melt(df_filtered, 
-                  id_vars=['Country Name', 'Country Code'], 
-                  var_name='Year', 
+    df_long = pd.melt(df_filtered,
+                  id_vars=['Country Name', 'Country Code'],
+                  var_name='Year',
                   value_name='Value')
-    
+
     # convert 'year' column from float to integer
     df_long['Year'] = df_long['Year'].astype(int)
     # change column names
-    df_long.columns = ['country', 'code', 'year', 'expenditure_per_capita']
+    df_long.columns = ['country', 'code', 'year', value_name]
     # sort df
     df_long = df_long.sort_values(['code', 'year'], ascending=[True, True])
     df_long = df_long.reset_index(drop=True)
+    return df_long
+
+
+def healthcare_expenditure_worldbank():
+    df = pd.read_csv("original_datasets/healthcare_expenditure_worldbank.csv")
+    df_long = clean_worldbank(df, 'expenditure_per_capita')
     # save df
     df_long.to_csv("cleaned_datasets/healthcare_expenditure_worldbank.csv", index=False)
+    record_key_stats("healthcare_expenditure_worldbank", df_long)
 
 
 def life_expectancy_worldbank():
     df = pd.read_csv("original_datasets/life_expectancy.csv")
-    df = df.rename(columns=df.iloc[3]).iloc[4:]
-    #drop columns not needed and only years from 2000 to 2019
-    columns_to_keep = ['Country Name', 'Country Code'] + \
-                   [col for col in df.columns if isinstance(col, float) and col >= 2000.0 and col<=2019]
-    df_filtered = df[columns_to_keep]
-    
-    #change the orientation of the dataframe and add years as observations instead of variables
-    df_long = pd.melt(df_filtered,
-                  id_vars=['Country Name', 'Country Code'],
-                  var_name='Year',
-                  value_name='Value')
-    
-    # convert 'year' column from float to integer
-    df_long['Year'] = df_long['Year'].astype(int)
-    # change column names
-    df_long.columns = ['country', 'code', 'year', 'life_expectancy']
-    # sort dataframe
-    df_long = df_long.sort_values(['code', 'year'], ascending=[True, True])
-    df_long = df_long.reset_index(drop=True)
-    df = df_long
+    df = clean_worldbank(df, 'life_expectancy')
     df.to_csv('cleaned_datasets/life_expectancy.csv', index=False)
     df_title = 'life_expectancy'
+    record_key_stats(df_title, df)
     analyze(df, df_title)
     print("Dataframe:", df, sep="\n")
     
@@ -126,14 +183,7 @@ def health_expenditure_as_percent_of_gdp():
     read_file = "original_datasets/filtered_health_expenditure_as_percent_gdp.csv"
     # cols 38 - 41 are NA for the first large chunk --> pandas must be told their type to not mix up types while reading in df in chunks to save memory
     df = pd.read_csv(read_file, dtype={i: object for i in range(38,42)})
-    # most of these are duplicate short-version columns
-    unnecessary_cols = [
-        'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION', 'MEASURE', 'UNIT_MEASURE', 'FREQ',
-        'FINANCING_SCHEME', 'PRICE_BASE', 'CURRENCY', 'BASE_PER', 'FUNCTION', 'MODE_PROVISION',
-        'FACTOR_PROVISION', 'ASSET_TYPE', 'Time period', 'Observation value', 'DECIMALS',
-        'Decimals', 'OBS_STATUS', 'OBS_STATUS2', 'OBS_STATUS3', 'Unit multiplier', 'UNIT_MULT',
-        'MODE_PROVISION'
-    ]
+    unnecessary_cols = EXPENDITURE_P_GDP_DROP_COLS
     data_cols_rename_dict = {
         'OBS_VALUE': 'health_expenditure_as_percent_gdp'
     }
@@ -160,6 +210,8 @@ def set_healthcare_capita_outcomes():
     # this is fine to do because base_period rows have corresponding duplicates without base_period
     df = df[df['base_period'].isna()].reset_index(drop=True).drop(columns=['base_period'])
     df.to_csv('cleaned_datasets/unfiltered_set_healthcare_capita_outcomes.csv', index=False)
+    # record the key stats again since tidy() recorded them before the base_period rows were dropped
+    record_key_stats(df_title, df)
     analyze(df, df_title)
     print(df)
 
@@ -168,12 +220,7 @@ def avoidable_mortality():
     read_file = "original_datasets/avoidable_mortality.csv"
     df = pd.read_csv(read_file)
     df_title = "avoidable_mortality"
-    unnecessary_cols = ["STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION", "FREQ", "MEASURE",
-                        "UNIT_MEASURE", "Time period", "Observation value", "UNIT_MULT",
-                        "DECIMALS", "Decimals", "AGE", "SOCIO_ECON_STATUS", "DEATH_CAUSE",
-                        "CALC_METHODOLOGY", "GESTATION_THRESHOLD", "HEALTH_STATUS", "DISEASE",
-                        "CANCER_SITE", "Observation value", "OBS_STATUS2", "SEX",
-                        "OBS_STATUS3"]
+    unnecessary_cols = AVOIDABLE_MORTALITY_DROP_COLS
     new_data_cols_rename_dict = {
         "OBS_VALUE": "avoidable_deaths"
     }
@@ -186,13 +233,7 @@ def avoidable_mortality():
 def hospital_stay_length():
     df = pd.read_csv("original_datasets/hospital_stay_length.csv")
     df_title = "hospital_stay_length"
-    unnecessary_cols = ["STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION", "MEASURE",
-                        "UNIT_MEASURE", "Time period", "Observation value", "UNIT_MULT",
-                        "DECIMALS", "Decimals", "AGE", "DISEASE", "DIAGNOSTIC_TYPE", "PROVIDER",
-                        "CANCER_SITE", "Observation value", "OBS_STATUS2", "SEX", "FUNCTION", 
-                        "MODE_PROVISION", "CARE_TYPE", "HEALTH_FACILITY", "WAITING_TIME",
-                        "CONSULTATION_TYPE", "OBS_STATUS", "OBS_STATUS2", "OBS_STATUS3", 
-                        "MEDICAL_PROCEDURE", "OCCUPATION"]
+    unnecessary_cols = HOSPITAL_STAY_DROP_COLS
     new_data_cols_rename_dict = {
         "OBS_VALUE": "hospital_stay_length"
     }
@@ -224,6 +265,7 @@ def gdp_worldbank():
     df = pd.melt(df, id_vars=['country', 'code'], var_name='year',
                   value_vars=new_year_columns, value_name='gdp_in_usd')
     df.to_csv('cleaned_datasets/country_gdps.csv', index=False)
+    record_key_stats('country_gdps', df)
 
 def oecd_population():
     df = pd.read_csv("original_datasets/oecd_population_data.csv")
@@ -233,6 +275,7 @@ def oecd_population():
     unique_countires =len(df["code"].unique())
     print(unique_countires)
     df.to_csv("cleaned_datasets/population.csv",index = False)
+    record_key_stats("population", df)
 
 
 
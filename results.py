@@ -1,14 +1,68 @@
 import seaborn as sns
 import pandas as pd
 import matplotlib.pyplot as plt
+from aggregates import load_aggregates, get_means
 
-df = pd.read_csv("cleaned_datasets/main_df.csv")
 
-new = df.groupby('code').mean()
-new = new.drop(columns = ['year'])
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    # per-country means of main_df from its precomputed aggregate table
+    new = get_means(load_aggregates()['code'])
+    quality_of_care_info = get_quality_of_care_info(new)
+
+    # choose normalized multipliers to be summed for the weighted average
+    #life expentacy has a really low standard deviation meaning that it does not mattter much in calucluation of effectiveness of healthcare 
+    #where as med tech avaibility and avoidable deaths have a really large standard deviation 
+    #decided how to weight based on standard deviation as a percent of mean
+    unweighted_multipliers = get_unweighted_multipliers(quality_of_care_info)
+    weighted_multipliers = weight_by_sd_as_perc_mean(quality_of_care_info)
+
+    # calculate results based on the different multipliers
+    results_unweighted = calculate_results(quality_of_care_info, unweighted_multipliers)
+    results_weighted = calculate_results(quality_of_care_info, weighted_multipliers)
+
+    #expenditure rankings 
+    #draw corellation between quality ranking and gdp ranking, and capita ranking seperately 
+    gdp_expenditure = rank_column(new, "health_expenditure_as_percent_gdp", False)['rank_df']
+    capita_expenditure = rank_column(new, 'expenditure_per_capita', False)['rank_df']
+
+    care_quality_vs_expenditure(results_unweighted, gdp_expenditure, 
+                                "Expenditure as a Percentage of GDP", "for Unweighted Multipliers")
+    care_quality_vs_expenditure(results_unweighted, capita_expenditure, 
+                                "Expenditure per Capita", "for Unweighted Multipliers")
+
+    care_quality_vs_expenditure(results_weighted, gdp_expenditure, 
+                                "Expenditure as a Percentage of GDP", "for Weighted Multipliers")
+    care_quality_vs_expenditure(results_weighted, capita_expenditure, 
+                                "Expenditure per Capita", "for Weighted Multipliers")
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+# quality of care columns and whether they are ranked in ascending order
+QUALITY_OF_CARE_COLUMNS = {
+    # lowest stay should be ranked 1st --> ascending = True
+    'hospital_stay_length': True,
+    # lowest technology availability should be ranked lowest --> ascending = False
+    'med_tech_availability_p_mil_ppl': False,
+    # lowest life expectancy should be ranked lowest --> ascending = False
+    'life_expectancy': False,
+    # lowest avoidable deaths should be ranked 1st --> ascending = True
+    'avoidable_deaths': True
+}
+
+#mean of each column over all the years by country
+def country_means(df):
+    new = df.groupby('code').mean(numeric_only=True)
+    new = new.drop(columns = ['year'])
+    return new
 
 #ranks by a column
-def rank_column(column,ascending):
+def rank_column(new, column, ascending):
     rank = new.sort_values(column,ascending = ascending)
     rank = rank.reset_index()
     rank['rank'] = rank.index+1
@@ -17,21 +71,15 @@ def rank_column(column,ascending):
     rank = rank[['rank','code',column]]
     return {'rank_df':rank, 'mean':mean_col_value, 'sd':sd_col}
 
-
-quality_of_care_info = {
-    # lowest stay should be ranked 1st --> ascending = True
-    'hospital_stay_length':rank_column('hospital_stay_length', True),
-    # lowest technology availability should be ranked lowest --> ascending = False
-    'med_tech_availability_p_mil_ppl':rank_column('med_tech_availability_p_mil_ppl', False),
-    # lowest life expectancy should be ranked lowest --> ascending = False
-    'life_expectancy':rank_column('life_expectancy', False),
-    # lowest avoidable deaths should be ranked 1st --> ascending = True
-    'avoidable_deaths':rank_column("avoidable_deaths", True)
-}
-[hos_stay, med_ava, life_exp, avoidable_death] = [data['rank_df'] for data in quality_of_care_info.values()]
+def get_quality_of_care_info(new):
+    """Rank each quality of care column, mapping the column to its rank_column() result"""
+    return {column: rank_column(new, column, ascending)
+            for column, ascending in QUALITY_OF_CARE_COLUMNS.items()}
 
 #weighted average 
-def weight_averages(multipliers_dict):
+def weight_averages(quality_of_care_info, multipliers_dict):
+    [hos_stay, med_ava, life_exp, avoidable_death] = [quality_of_care_info[column]['rank_df']
+                                                      for column in QUALITY_OF_CARE_COLUMNS]
     columns = ['code','rank']
     # get dataframes ready to be merged, only including the code and rank columns
     df_pair_1 = [hos_stay[columns], med_ava[columns]]
@@ -48,6 +96,11 @@ def weight_averages(multipliers_dict):
 
     return rank_df
         
+# equal weights for every ranked column
+def get_unweighted_multipliers(quality_of_care_dict):
+    rank_titles = ['rank_' + title for title in quality_of_care_dict.keys()]
+    return dict(zip(rank_titles, [1 / len(rank_titles)]*len(rank_titles)))
+
 # calculate the weights based on variability (sd as a percent of mean)
 def weight_by_sd_as_perc_mean(quality_of_care_dict):
     """Determine the weights based on standard deviation as a percent of mean, all normalized"""
@@ -62,35 +115,18 @@ def weight_by_sd_as_perc_mean(quality_of_care_dict):
     weights_dict = {title: weight/total_weight for title, weight in weights_dict.items()}
     return weights_dict
 
-# choose normalized multipliers to be summed for the weighted average
-#life expentacy has a really low standard deviation meaning that it does not mattter much in calucluation of effectiveness of healthcare 
-#where as med tech avaibility and avoidable deaths have a really large standard deviation 
-#decided how to weight based on standard deviation as a percent of mean
-rank_titles = ['rank_' + title for title in quality_of_care_info.keys()]
-unweighted_multipliers = dict(zip(rank_titles, [0.25]*4))
-weighted_multipliers = weight_by_sd_as_perc_mean(quality_of_care_info)
-
 #results dataframe organization
-def calculate_results(multipliers):
+def calculate_results(quality_of_care_info, multipliers):
     """Given a dictionary of column names and multipliers, calculate the weighted average.
     Return a dataframe containing the final rank, code, and the weighted average of all ranked variables.
     """
-    rank_df = weight_averages(multipliers)
+    rank_df = weight_averages(quality_of_care_info, multipliers)
     results_df = rank_df.sort_values("rank_weighted_avg",ascending = True)
     results_df = results_df.reset_index(drop = True)
     results_df["rank"] = results_df.index + 1
     results_df = results_df[["rank", "code", "rank_weighted_avg"]]
     return results_df
 
-# calculate results based on the different multipliers
-results_unweighted = calculate_results(weighted_multipliers)
-results_weighted = calculate_results(weighted_multipliers)
-
-#expenditure rankings 
-#draw corellation between quality ranking and gdp ranking, and capita ranking seperately 
-gdp_expenditure = rank_column("health_expenditure_as_percent_gdp", False)['rank_df']
-capita_expenditure = rank_column('expenditure_per_capita', False)['rank_df']
-
 #correlation of rankings visulizations 
 def care_quality_vs_expenditure(results_df, expenditure_rank_df, metric_title, graph_suffix):
     merged_df = pd.merge(results_df, expenditure_rank_df, on = ['code'], suffixes = ["_final","_health_expenditure"])
@@ -99,12 +135,7 @@ def care_quality_vs_expenditure(results_df, expenditure_rank_df, metric_title, g
     sns.scatterplot(data= merged_df, y='rank_final', x='rank_health_expenditure')
     plt.show()
 
-care_quality_vs_expenditure(results_unweighted, gdp_expenditure, 
-                            "Expenditure as a Percentage of GDP", "for Unweighted Multipliers")
-care_quality_vs_expenditure(results_unweighted, capita_expenditure, 
-                            "Expenditure per Capita", "for Unweighted Multipliers")
 
-care_quality_vs_expenditure(results_weighted, gdp_expenditure, 
-                            "Expenditure as a Percentage of GDP", "for Weighted Multipliers")
-care_quality_vs_expenditure(results_weighted, capita_expenditure, 
-                            "Expenditure per Capita", "for Weighted Multipliers")
\ No newline at end of file
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,227 @@
+"""
+Revisions: compare two versions of an OECD export and ingest only the observations that changed.
+
+OECD republishes whole files when a handful of observations are revised. Every raw row is
+hashed on its dimension key (REF_AREA, TIME_PERIOD, and the other SDMX dimension columns) and
+on its value. Comparing the hashes finds the added, removed, and changed observations. When
+a revision is ingested, only the affected (code, year) cells go through tidy(). The matching
+rows of the cleaned dataset, inner_merged, and main_df are then replaced, and the aggregate
+tables of main_df are updated for those rows.
+
+Usage:
+    python revisions.py <old version csv> <new version csv>
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+from aggregates import save_aggregates, update_aggregates
+from key_stats import record_key_stats
+from merge import merge_data, drop_bad_countries_from_merged, MERGED_DATASET_FILES
+from preprocess_data import RAW_SOURCES
+from tidy import tidy, sort_by_country_and_year
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run(old_read_file, new_read_file):
+    old_df = pd.read_csv(old_read_file, dtype=str)
+    new_df = pd.read_csv(new_read_file, dtype=str)
+    diff = diff_revisions(old_df, new_df)
+    print_diff(diff)
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+# uppercase SDMX columns that are attributes or metadata rather than dimensions
+NON_DIMENSION_COLUMNS = [
+    "STRUCTURE", "STRUCTURE_ID", "STRUCTURE_NAME", "ACTION", "OBS_VALUE", "OBS_STATUS",
+    "OBS_STATUS2", "OBS_STATUS3", "DECIMALS", "UNIT_MULT", "BASE_PER", "REF_YEAR_PRICE",
+    "CURRENCY"
+]
+REVISION_CHANGE_TYPES = ["added", "removed", "changed"]
+
+
+def get_dimension_columns(df: pd.DataFrame) -> list[str]:
+    """
+    Get the SDMX dimension columns that identify an observation in a raw OECD dataframe
+    (the uppercase code columns, not their lowercase label duplicates)
+    """
+    if "REF_AREA" not in df.columns or "TIME_PERIOD" not in df.columns:
+        raise ValueError("dataframe is not an OECD SDMX export, expected REF_AREA and TIME_PERIOD columns")
+    return [col for col in df.columns if col.isupper() and col not in NON_DIMENSION_COLUMNS]
+
+
+def hash_rows(df: pd.DataFrame, key_columns: list[str], value_column: str = "OBS_VALUE") -> pd.DataFrame:
+    """
+    Hash every row of a raw dataframe on its dimension key and on its value
+    Parameters:
+        df - raw dataframe
+        key_columns - dimension columns that identify an observation
+        value_column - column holding the observation value
+    Returns:
+        DataFrame with the same index as df and key_hash and value_hash columns
+    """
+    # compare keys as strings and values as floats so the same export read with different
+    # dtypes (ex: 2019 vs "2019", 7 vs 7.0) gets the same hashes
+    keys = df[key_columns].astype(str)
+    values = pd.to_numeric(df[value_column], errors="coerce").astype("float64")
+    key_hash = pd.util.hash_pandas_object(keys, index=False)
+    value_hash = pd.util.hash_pandas_object(values, index=False)
+    return pd.DataFrame({"key_hash": key_hash.to_numpy(), "value_hash": value_hash.to_numpy()},
+                        index=df.index)
+
+
+def diff_revisions(old_df: pd.DataFrame, new_df: pd.DataFrame,
+                   value_column: str = "OBS_VALUE") -> dict[str, pd.DataFrame]:
+    """
+    Find the observations that were added, removed, or changed between two versions of a raw export
+    Parameters:
+        old_df - raw dataframe of the old version
+        new_df - raw dataframe of the new version
+        value_column - column holding the observation value
+    Returns:
+        dict mapping each of REVISION_CHANGE_TYPES to a DataFrame of rows:
+            - added: rows of new_df whose key isn't in old_df
+            - removed: rows of old_df whose key isn't in new_df
+            - changed: rows of new_df whose key is in old_df with a different value
+    """
+    key_columns = get_dimension_columns(new_df)
+    if set(key_columns) != set(get_dimension_columns(old_df)):
+        raise ValueError("the two versions have different dimension columns, a full reprocess is needed")
+    old_hashes = hash_rows(old_df, key_columns, value_column)
+    new_hashes = hash_rows(new_df, key_columns, value_column)
+    for version, hashes in [("old", old_hashes), ("new", new_hashes)]:
+        if hashes["key_hash"].duplicated().any():
+            raise ValueError(f"the {version} version has several rows with the same dimension key")
+
+    old_hashes = old_hashes.reset_index(names="old_row")
+    new_hashes = new_hashes.reset_index(names="new_row")
+    joined = old_hashes.merge(new_hashes, on="key_hash", how="outer",
+                              suffixes=("_old", "_new"), indicator=True)
+    in_both = joined["_merge"] == "both"
+    changed = in_both & (joined["value_hash_old"] != joined["value_hash_new"])
+    return {
+        "added": new_df.loc[joined.loc[joined["_merge"] == "right_only", "new_row"]],
+        "removed": old_df.loc[joined.loc[joined["_merge"] == "left_only", "old_row"]],
+        "changed": new_df.loc[joined.loc[changed, "new_row"]],
+    }
+
+
+def print_diff(diff: dict[str, pd.DataFrame]):
+    """Print how many observations were added, removed, and changed, along with the rows"""
+    for change_type in REVISION_CHANGE_TYPES:
+        rows = diff[change_type]
+        print(f"{change_type}: {len(rows)} observations")
+        if len(rows):
+            print(rows[["REF_AREA", "TIME_PERIOD", "OBS_VALUE"]], "\n")
+
+
+def get_affected_cells(diff: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Get every (code, year) cell with at least one added, removed, or changed observation
+    Returns:
+        DataFrame with unique code and year columns
+    """
+    cells = pd.concat([diff[change_type][["REF_AREA", "TIME_PERIOD"]] for change_type in REVISION_CHANGE_TYPES])
+    cells = cells.rename(columns={"REF_AREA": "code", "TIME_PERIOD": "year"})
+    cells["year"] = cells["year"].astype("int64")
+    return cells.drop_duplicates().reset_index(drop=True)
+
+
+def _in_cells(df: pd.DataFrame, cells: pd.DataFrame, code_column: str = "code",
+              year_column: str = "year") -> np.ndarray:
+    """Boolean mask of the rows of df whose (code, year) is one of the cells"""
+    df_cells = df[[code_column, year_column]].astype({year_column: "int64"})
+    return pd.MultiIndex.from_frame(df_cells).isin(pd.MultiIndex.from_frame(cells[["code", "year"]]))
+
+
+def replace_cells(df: pd.DataFrame, cells: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Replace all rows of df in the given (code, year) cells with new_rows"""
+    df = df[~_in_cells(df, cells)]
+    df = pd.concat([df, new_rows[df.columns]], ignore_index=True)
+    df = sort_by_country_and_year(df)
+    return df.reset_index(drop=True)
+
+
+def ingest_revision(column: str, new_read_file: str, replace_original: bool = True) -> dict[str, pd.DataFrame]:
+    """
+    Update the cleaned dataset, inner_merged, and main_df for a revised version of a raw OECD export,
+    only reprocessing the (code, year) cells that the revision touched
+
+    Parameters:
+        column - data column of the revised dataset, one of the keys in preprocess_data.RAW_SOURCES
+        new_read_file - path to the new version of the raw export
+        replace_original - whether to copy the new version over the old one in original_datasets
+
+    Returns:
+        the diff between the two versions (see diff_revisions())
+
+    Side Effects:
+        Saves the updated dataset to cleaned_datasets, along with inner_merged, main_df, and the
+        aggregate tables of main_df
+        (informational_datasets is not updated, rerun preprocess_data.py for that)
+    """
+    source = RAW_SOURCES[column]
+    if source.get("worldbank", False):
+        raise ValueError(f"{column} is a World Bank dataset, only OECD exports can be ingested incrementally")
+    read_kwargs = source.get("read_kwargs", {})
+    old_df = pd.read_csv(source["read_file"], **read_kwargs)
+    new_df = pd.read_csv(new_read_file, **read_kwargs)
+    diff = diff_revisions(old_df, new_df)
+    cells = get_affected_cells(diff)
+    if len(cells) == 0:
+        return diff
+
+    # push only the rows of the affected cells through tidy()
+    new_cell_rows = new_df[_in_cells(new_df, cells, "REF_AREA", "TIME_PERIOD")]
+    cleaned_file = MERGED_DATASET_FILES[column]
+    cleaned_df = pd.read_csv(cleaned_file)
+    if len(new_cell_rows):
+        # na_proportion above 1 so the value column is kept even if all its values in the cells are NA
+        cleaned_cell_rows = tidy(new_cell_rows, column, {"OBS_VALUE": column},
+                                 drop_columns=source["drop_columns"], na_proportion=1.1, save=False)
+        cleaned_cell_rows = cleaned_cell_rows.reindex(columns=cleaned_df.columns)
+    else:
+        # the revision only removed observations
+        cleaned_cell_rows = cleaned_df.iloc[:0]
+    cleaned_df = replace_cells(cleaned_df, cells, cleaned_cell_rows)
+
+    # re-merge the affected cells with the other datasets' rows for the same cells
+    datasets = {}
+    for other_column, other_file in MERGED_DATASET_FILES.items():
+        other_df = cleaned_df if other_column == column else pd.read_csv(other_file)
+        datasets[other_column] = other_df[_in_cells(other_df, cells)]
+    merged_cell_rows = merge_data(datasets)
+    inner_merged = pd.read_csv("cleaned_datasets/inner_merged.csv")
+    inner_merged = replace_cells(inner_merged, cells, merged_cell_rows)
+    old_main_df = pd.read_csv("cleaned_datasets/main_df.csv")
+    main_df = drop_bad_countries_from_merged(inner_merged)
+
+    # update the aggregate tables with the main_df rows in the affected cells, along with every
+    # row of the countries that went over or under min_years_threshold
+    changed_codes = set(old_main_df["code"]) ^ set(main_df["code"])
+    old_rows = old_main_df[_in_cells(old_main_df, cells) | old_main_df["code"].isin(changed_codes)]
+    new_rows = main_df[_in_cells(main_df, cells) | main_df["code"].isin(changed_codes)]
+    aggregates = update_aggregates(old_rows, new_rows, save=False)
+
+    # only save once every output is computed, so a failing step leaves the saved files in step
+    cleaned_df.to_csv(cleaned_file, index=False)
+    record_key_stats(os.path.splitext(os.path.basename(cleaned_file))[0], cleaned_df)
+    inner_merged.to_csv("cleaned_datasets/inner_merged.csv", index=False)
+    main_df.to_csv("cleaned_datasets/main_df.csv", index=False)
+    save_aggregates(aggregates)
+
+    if replace_original and new_read_file != source["read_file"]:
+        shutil.copyfile(new_read_file, source["read_file"])
+    return diff
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run(sys.argv[1], sys.argv[2])
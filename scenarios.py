@@ -0,0 +1,227 @@
+"""
+Scenarios: rerun the cleaning, merging, and ranking steps for a grid of analysis parameters.
+
+Each raw dataset in original_datasets is read only once. Every scenario then works from the same
+parsed dataframes instead of rereading the csv files. Scenarios that share the same cleaning
+parameters also share one cleaned and merged dataframe. Groups of scenarios run in parallel
+worker processes. On Linux the workers are forked and inherit the parsed dataframes without
+copying or reparsing them. Elsewhere the dataframes are sent once to each worker.
+
+Not every raw file in RAW_SOURCES is in original_datasets yet: the avoidable mortality, hospital
+stay length, and medical technology exports are missing, so load_raw_sources() raises a
+FileNotFoundError naming them until they are added. run_scenarios() can still be given raw
+dataframes directly.
+
+Scenario parameters (see DEFAULT_SCENARIO):
+ - min_year, max_year: inclusive range of years kept while tidying
+ - na_proportion: columns with at least this proportion of NA values are dropped while tidying
+ - min_years_threshold: countries with fewer years of merged data are dropped from main_df
+ - multipliers: 'weighted', 'unweighted', or a dict mapping rank columns to multipliers
+"""
+import itertools
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from merge import merge_data, drop_bad_countries_from_merged
+from preprocess_data import clean_worldbank, RAW_SOURCES
+from results import (country_means, rank_column, get_quality_of_care_info,
+                     get_unweighted_multipliers, weight_by_sd_as_perc_mean, calculate_results)
+from tidy import tidy
+
+
+# ==================================================================================
+# CALLING FUNCTIONS - comment out functions inside run() that you don't want to run
+# ==================================================================================
+
+def run():
+    scenarios = scenario_grid(min_year=[2000, 2005], min_years_threshold=[5, 10, 15],
+                              multipliers=['unweighted', 'weighted'])
+    _, comparison_df = run_scenarios(scenarios)
+    print(comparison_df)
+
+# =============================================
+# FUNCTION DEFINITIONS - no need to comment out
+# =============================================
+
+# the parameters used by preprocess_data.py, merge.py, and results.py
+DEFAULT_SCENARIO = {
+    'min_year': 2000,
+    'max_year': 2019,
+    'na_proportion': 0.9,
+    'min_years_threshold': 10,
+    'multipliers': 'weighted'
+}
+# scenario parameters that change the cleaned and merged datasets
+CLEANING_PARAMS = ['min_year', 'max_year', 'na_proportion']
+
+# parsed raw dataframes that worker processes evaluate scenarios on
+_RAW_FRAMES = None
+
+
+def load_raw_sources() -> dict[str, pd.DataFrame]:
+    """
+    Read every raw file in RAW_SOURCES once
+    Returns:
+        dict mapping each data column to its raw dataframe
+    """
+    missing_files = [source['read_file'] for source in RAW_SOURCES.values()
+                     if not os.path.exists(source['read_file'])]
+    if missing_files:
+        raise FileNotFoundError(f"raw files missing from original_datasets: {missing_files}, "
+                                "download them or pass raw_frames to run_scenarios() directly")
+    return {column: pd.read_csv(source['read_file'], **source.get('read_kwargs', {}))
+            for column, source in RAW_SOURCES.items()}
+
+
+def scenario_grid(**param_values) -> list[dict]:
+    """
+    Build one scenario for every combination of the given parameter values
+    Parameters:
+        param_values - lists of values for any of the parameters in DEFAULT_SCENARIO
+            - ex: scenario_grid(min_year=[2000, 2005], min_years_threshold=[5, 10])
+    Returns:
+        list of scenario dicts, each with a 'name' describing its non-default parameters
+    """
+    unknown_params = [param for param in param_values if param not in DEFAULT_SCENARIO]
+    if unknown_params:
+        raise ValueError(f"unknown scenario parameters {unknown_params}, expected some of {list(DEFAULT_SCENARIO)}")
+    params = list(param_values)
+    scenarios = []
+    for values in itertools.product(*param_values.values()):
+        scenario = dict(DEFAULT_SCENARIO)
+        scenario.update(zip(params, values))
+        scenario['name'] = ", ".join(f"{param}={value}" for param, value in zip(params, values)) or "default"
+        scenarios.append(scenario)
+    return scenarios
+
+
+def clean_raw_sources(raw_frames: dict[str, pd.DataFrame], min_year: int = 2000,
+                      max_year: int = 2019, na_proportion: float = 0.9) -> dict[str, pd.DataFrame]:
+    """
+    Clean every raw dataframe the same way preprocess_data.py does, without saving anything
+    Returns:
+        dict mapping each data column to its cleaned dataframe
+    """
+    datasets = {}
+    for column, source in RAW_SOURCES.items():
+        df = raw_frames[column]
+        if source.get('worldbank', False):
+            datasets[column] = clean_worldbank(df, column, min_year=min_year, max_year=max_year)
+        else:
+            datasets[column] = tidy(df, column, {'OBS_VALUE': column},
+                                    drop_columns=source['drop_columns'], min_year=min_year,
+                                    max_year=max_year, na_proportion=na_proportion, save=False)
+    return datasets
+
+
+def evaluate_scenario(merged_df: pd.DataFrame, scenario: dict) -> dict:
+    """
+    Rank countries on the merged dataframe with the scenario's downstream parameters
+    Parameters:
+        merged_df - merged dataframe from merge_data(), before dropping countries
+        scenario - scenario dict (see DEFAULT_SCENARIO)
+    Returns:
+        dict with the scenario, its main_df, results (final ranking), and correlations
+        between the final rank and each expenditure rank
+    """
+    main_df = drop_bad_countries_from_merged(merged_df, scenario['min_years_threshold'], verbose=False)
+    new = country_means(main_df)
+    quality_of_care_info = get_quality_of_care_info(new)
+    multipliers = scenario['multipliers']
+    if multipliers == 'weighted':
+        multipliers = weight_by_sd_as_perc_mean(quality_of_care_info)
+    elif multipliers == 'unweighted':
+        multipliers = get_unweighted_multipliers(quality_of_care_info)
+    elif not isinstance(multipliers, dict):
+        raise ValueError(f"multipliers must be 'weighted', 'unweighted', or a dict, not {multipliers!r}")
+    results_df = calculate_results(quality_of_care_info, multipliers)
+
+    # correlation of the final rank with each expenditure rank (same as linregress r_value)
+    correlations = {}
+    for column in ['health_expenditure_as_percent_gdp', 'expenditure_per_capita']:
+        expenditure_rank_df = rank_column(new, column, False)['rank_df']
+        ranks = pd.merge(results_df, expenditure_rank_df, on='code', suffixes=['_final', '_health_expenditure'])
+        correlations[column] = ranks['rank_final'].corr(ranks['rank_health_expenditure'])
+    return {'scenario': scenario, 'main_df': main_df, 'results': results_df,
+            'correlations': correlations}
+
+
+def _evaluate_scenario_group(cleaning_params: dict, scenarios: list[dict],
+                             raw_frames: dict[str, pd.DataFrame] = None) -> list[dict]:
+    """Clean and merge once for a group of scenarios that share their cleaning parameters"""
+    if raw_frames is None:
+        raw_frames = _RAW_FRAMES
+    datasets = clean_raw_sources(raw_frames, **cleaning_params)
+    merged_df = merge_data(datasets)
+    return [evaluate_scenario(merged_df, scenario) for scenario in scenarios]
+
+
+def _init_worker(raw_frames):
+    global _RAW_FRAMES
+    _RAW_FRAMES = raw_frames
+
+
+def run_scenarios(scenarios: list[dict], raw_frames: dict[str, pd.DataFrame] = None,
+                  max_workers: int = None) -> tuple[dict[str, dict], pd.DataFrame]:
+    """
+    Evaluate every scenario, reading the raw datasets only once
+    Parameters:
+        scenarios - list of scenario dicts, such as the ones from scenario_grid()
+        raw_frames - parsed raw dataframes from load_raw_sources(), read if None
+        max_workers - number of worker processes, 1 runs everything in this process
+    Returns:
+        - dict mapping each scenario name to its evaluate_scenario() output
+        - comparison DataFrame with one row per scenario
+    """
+    global _RAW_FRAMES
+    if raw_frames is None:
+        raw_frames = load_raw_sources()
+    # group the scenarios so each set of cleaning parameters is only cleaned and merged once
+    groups = {}
+    for scenario in scenarios:
+        key = tuple(scenario[param] for param in CLEANING_PARAMS)
+        groups.setdefault(key, []).append(scenario)
+    tasks = [(dict(zip(CLEANING_PARAMS, key)), group) for key, group in groups.items()]
+
+    if max_workers == 1 or len(tasks) == 1:
+        group_outputs = [_evaluate_scenario_group(params, group, raw_frames) for params, group in tasks]
+    else:
+        if sys.platform.startswith("linux"):
+            # forked workers share the parent's parsed dataframes (fork isn't safe on macOS)
+            _RAW_FRAMES = raw_frames
+            pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("fork"))
+        else:
+            # otherwise the dataframes are sent once to each worker, not once per scenario
+            pool = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(raw_frames,))
+        try:
+            with pool:
+                futures = [pool.submit(_evaluate_scenario_group, params, group) for params, group in tasks]
+                group_outputs = [future.result() for future in futures]
+        finally:
+            _RAW_FRAMES = None
+
+    outputs = {}
+    comparison_rows = []
+    for group_output in group_outputs:
+        for output in group_output:
+            scenario = output['scenario']
+            outputs[scenario['name']] = output
+            row = {param: scenario[param] for param in ['name'] + list(DEFAULT_SCENARIO)}
+            if isinstance(row['multipliers'], dict):
+                row['multipliers'] = 'custom'
+            row['num_countries'] = output['main_df']['code'].nunique()
+            row['num_rows'] = len(output['main_df'])
+            row['top_country'] = output['results']['code'].iloc[0] if len(output['results']) else None
+            for column, correlation in output['correlations'].items():
+                row[f'rank_corr_{column}'] = correlation
+            comparison_rows.append(row)
+    comparison_df = pd.DataFrame(comparison_rows)
+    return outputs, comparison_df
+
+
+# RUNNING MAIN PROGRAM
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,56 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import (compute_aggregates, rebuild_aggregates, update_aggregates,
+                        get_means, get_variances, get_correlations)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def main_df():
+    df = pd.read_csv(os.path.join(REPO_ROOT, 'cleaned_datasets/main_df.csv'))
+    # blank out some values, including every value of one column for one country
+    rng = np.random.default_rng(0)
+    df.loc[rng.choice(len(df), 40, replace=False), 'life_expectancy'] = np.nan
+    df.loc[rng.choice(len(df), 40, replace=False), 'avoidable_deaths'] = np.nan
+    df.loc[df['code'] == df['code'].iloc[0], 'hospital_stay_length'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('group', ['code', 'year'])
+def test_stats_match_groupby_with_na_values(main_df, group):
+    aggregates = compute_aggregates(main_df, group)
+    grouped = main_df.drop(columns=['code', 'year'])
+    grouped = grouped.groupby(main_df[group])
+    columns = list(grouped.mean().columns)
+    pd.testing.assert_frame_equal(get_means(aggregates), grouped.mean()[columns], check_names=False)
+    pd.testing.assert_frame_equal(get_variances(aggregates), grouped.var()[columns], check_names=False)
+    for column_1, column_2 in itertools.permutations(columns, 2):
+        expected = grouped.apply(lambda x: x[column_1].corr(x[column_2]))
+        pd.testing.assert_series_equal(get_correlations(aggregates, column_1, column_2), expected,
+                                       check_names=False)
+
+
+def test_update_matches_rebuild(main_df):
+    aggregates = rebuild_aggregates(main_df, save=False)
+    edited = main_df.copy()
+    changed = edited.index[:25]
+    edited.loc[changed, 'expenditure_per_capita'] *= 1.1
+    edited.loc[changed[:5], 'life_expectancy'] = np.nan
+    # remove one country entirely, and add a new one
+    removed = edited['code'] == edited['code'].iloc[-1]
+    added = edited[edited['code'] == edited['code'].iloc[0]].assign(code='ZZZ')
+    edited = pd.concat([edited[~removed], added], ignore_index=True)
+
+    old_rows = pd.concat([main_df.loc[changed], main_df[removed]])
+    new_rows = pd.concat([edited.loc[changed], added])
+    updated = update_aggregates(old_rows, new_rows, aggregates, save=False)
+    rebuilt = rebuild_aggregates(edited, save=False)
+    for group in rebuilt:
+        pd.testing.assert_frame_equal(updated[group], rebuilt[group][updated[group].columns],
+                                      check_exact=False, rtol=1e-9)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gap_filling import fill_gaps, build_gap_filled_panel
+from merge import MERGED_DATASET_FILES
+
+nan = np.nan
+
+
+def _panel(*rows):
+    """(country, year, indicator) array with one indicator, one country per row"""
+    return np.array(rows, dtype='float64')[:, :, np.newaxis]
+
+
+@pytest.mark.parametrize('method', ['interpolate', 'ffill'])
+def test_leading_and_trailing_gaps_stay_na(method):
+    filled, imputed = fill_gaps(_panel([nan, nan, 1, 2, nan]), method=method, limit=2)
+    assert np.isnan(filled[0, :2, 0]).all()
+    assert not imputed[0, :2, 0].any()
+    if method == 'interpolate':
+        # nothing after the last known year to interpolate towards
+        assert np.isnan(filled[0, 4, 0]) and not imputed[0, 4, 0]
+    else:
+        assert filled[0, 4, 0] == 2 and imputed[0, 4, 0]
+
+
+def test_interpolate_fills_gaps_up_to_limit():
+    panel = _panel([0, nan, nan, 3, nan, nan, nan, 7])
+    filled, imputed = fill_gaps(panel, method='interpolate', limit=2)
+    np.testing.assert_array_equal(filled[0, :4, 0], [0, 1, 2, 3])
+    # the second gap is limit + 1 years long, so it is left as it is
+    assert np.isnan(filled[0, 4:7, 0]).all()
+    np.testing.assert_array_equal(imputed[0, :, 0], [False, True, True, False, False, False, False, False])
+
+
+def test_ffill_fills_only_limit_years_after_a_known_year():
+    panel = _panel([5, nan, nan, 3, nan, nan, nan])
+    filled, imputed = fill_gaps(panel, method='ffill', limit=2)
+    np.testing.assert_array_equal(filled[0, :6, 0], [5, 5, 5, 3, 3, 3])
+    assert np.isnan(filled[0, 6, 0])
+    np.testing.assert_array_equal(imputed[0, :, 0], [False, True, True, False, True, True, False])
+
+
+def test_countries_and_indicators_are_filled_separately():
+    panel = np.stack([_panel([1, nan, 3], [nan, 4, nan])[:, :, 0],
+                      _panel([nan, 2, 2], [6, nan, 8])[:, :, 0]], axis=2)
+    filled, imputed = fill_gaps(panel, method='interpolate', limit=1)
+    np.testing.assert_array_equal(filled[0, :, 0], [1, 2, 3])
+    np.testing.assert_array_equal(filled[1, :, 1], [6, 7, 8])
+    assert np.isnan(filled[1, 0, 0]) and np.isnan(filled[0, 0, 1])
+    assert imputed.sum() == 2
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        fill_gaps(_panel([1, nan]), method='bfill')
+
+
+def test_min_years_threshold_counts_complete_years_only():
+    years = list(range(2000, 2004))
+    datasets = {}
+    for column in MERGED_DATASET_FILES:
+        # BEL has every year of every column but the last, which only has 2000
+        values = [1.0] * 4 if column != 'med_tech_availability_p_mil_ppl' else [1.0]
+        datasets[column] = pd.DataFrame({'code': ['AUS'] * 4 + ['BEL'] * len(values),
+                                         'year': years + years[:len(values)],
+                                         column: [1.0] * 4 + values})
+    for drop_incomplete in [True, False]:
+        df = build_gap_filled_panel(datasets, limit=0, min_years_threshold=2, drop_incomplete=drop_incomplete)
+        assert set(df['code']) == {'AUS'}
@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+
+import key_stats
+from merge import merge_data, MERGED_DATASET_FILES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def test_saved_key_counts_match_the_cleaned_datasets():
+    for read_file in MERGED_DATASET_FILES.values():
+        df_title = os.path.splitext(os.path.basename(read_file))[0]
+        saved = pd.read_csv(key_stats.key_counts_file(df_title), index_col=key_stats.KEY_COLUMNS)['rows']
+        counted = key_stats.key_counts(pd.read_csv(read_file))
+        pd.testing.assert_series_equal(saved.sort_index(), counted.rename('rows').sort_index())
+
+
+def test_merge_uses_saved_key_counts(monkeypatch):
+    loaded = []
+
+    def load_key_counts(df_title, df):
+        loaded.append(df_title)
+        return key_stats.load_key_counts(df_title, df)
+
+    monkeypatch.setattr('merge.load_key_counts', load_key_counts)
+    with pytest.raises(ValueError, match="max_fanout"):
+        merge_data(on_fanout='raise')
+    assert len(loaded) == len(MERGED_DATASET_FILES)
+    merged = merge_data()
+    pd.testing.assert_frame_equal(merged, pd.read_csv('cleaned_datasets/inner_merged.csv'))
+
+
+def test_stale_key_counts_are_counted_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(key_stats, 'KEY_COUNTS_DIR', str(tmp_path))
+    monkeypatch.setattr(key_stats, 'KEY_STATS_FILE', str(tmp_path / 'key_stats.csv'))
+    df = pd.DataFrame({'code': ['AUS', 'AUS', 'BEL'], 'year': [2000, 2000, 2000], 'value': [1, 2, 3]})
+    key_stats.record_key_stats('example', df)
+    assert key_stats.load_key_counts('example', df).to_dict() == {('AUS', 2000): 2, ('BEL', 2000): 1}
+    assert key_stats.load_key_counts('example', df.iloc[1:]).to_dict() == {('AUS', 2000): 1, ('BEL', 2000): 1}
+    # same number of rows, but different keys
+    regenerated = df.assign(code=['AUS', 'BEL', 'BEL'])
+    assert key_stats.load_key_counts('example', regenerated).to_dict() == {('AUS', 2000): 1, ('BEL', 2000): 2}
+
+
+def test_fanout_counts_the_biggest_merge_along_the_way():
+    a = pd.DataFrame({'code': ['AUS'] * 3000, 'year': 2000, 'a': 1.0})
+    b = pd.DataFrame({'code': ['AUS'] * 3000, 'year': 2000, 'b': 1.0})
+    c = pd.DataFrame({'code': ['BEL'], 'year': 2000, 'c': 1.0})
+    counts = [key_stats.key_counts(df) for df in [a, b, c]]
+    assert key_stats.estimate_merge_size(counts, 'inner') == (9_000_000, 0)
+    assert key_stats.merge_fanout([a, b, c]) == (9_000_000, 3000.0)
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import revisions
+from aggregates import load_aggregates, rebuild_aggregates
+from preprocess_data import RAW_SOURCES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMN = 'health_expenditure_as_percent_gdp'
+
+
+@pytest.fixture
+def raw_df(tmp_path, monkeypatch):
+    """Work on copies of the datasets so ingesting a revision doesn't change the repo's files"""
+    shutil.copytree(os.path.join(REPO_ROOT, 'cleaned_datasets'), tmp_path / 'cleaned_datasets')
+    os.makedirs(tmp_path / 'original_datasets')
+    read_file = RAW_SOURCES[COLUMN]['read_file']
+    shutil.copyfile(os.path.join(REPO_ROOT, read_file), tmp_path / read_file)
+    monkeypatch.chdir(tmp_path)
+    return pd.read_csv(read_file, **RAW_SOURCES[COLUMN]['read_kwargs'])
+
+
+def test_ingest_revision_that_only_removes_rows(raw_df):
+    main_df = pd.read_csv('cleaned_datasets/main_df.csv')
+    code, year = main_df.loc[0, ['code', 'year']]
+    removed = (raw_df['REF_AREA'] == code) & (raw_df['TIME_PERIOD'] == year)
+    assert removed.any()
+    raw_df[~removed].to_csv('new_version.csv', index=False)
+
+    diff = revisions.ingest_revision(COLUMN, 'new_version.csv', replace_original=False)
+
+    assert len(diff['removed']) == removed.sum() and len(diff['added']) == len(diff['changed']) == 0
+    for read_file in ['cleaned_datasets/filtered_health_expenditure_as_percent_gdp.csv',
+                      'cleaned_datasets/inner_merged.csv']:
+        df = pd.read_csv(read_file)
+        assert not ((df['code'] == code) & (df['year'] == year)).any()
+
+
+def test_ingest_revision_that_only_adds_rows_outside_the_years_kept(raw_df):
+    cleaned_file = 'cleaned_datasets/filtered_health_expenditure_as_percent_gdp.csv'
+    cleaned_before = pd.read_csv(cleaned_file)
+    main_df_before = pd.read_csv('cleaned_datasets/main_df.csv')
+    codes_with_2021 = set(raw_df.loc[raw_df['TIME_PERIOD'] == 2021, 'REF_AREA'])
+    added = raw_df[~raw_df['REF_AREA'].isin(codes_with_2021)].head(1).copy()
+    added['TIME_PERIOD'] = 2021
+    pd.concat([raw_df, added]).to_csv('new_version.csv', index=False)
+
+    diff = revisions.ingest_revision(COLUMN, 'new_version.csv', replace_original=False)
+
+    assert len(diff['added']) == 1 and len(diff['removed']) == len(diff['changed']) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(cleaned_file), cleaned_before)
+    pd.testing.assert_frame_equal(pd.read_csv('cleaned_datasets/main_df.csv'), main_df_before)
+
+
+def test_failed_ingest_leaves_saved_files_unchanged(raw_df, monkeypatch):
+    saved_files = ['cleaned_datasets/filtered_health_expenditure_as_percent_gdp.csv',
+                   'cleaned_datasets/inner_merged.csv', 'cleaned_datasets/main_df.csv',
+                   'cleaned_datasets/main_df_aggregates_by_code.csv']
+    before = {read_file: open(read_file).read() for read_file in saved_files}
+    raw_df.loc[raw_df.index[0], 'OBS_VALUE'] += 1
+    raw_df.to_csv('new_version.csv', index=False)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("aggregate update failed")
+
+    monkeypatch.setattr(revisions, 'update_aggregates', fail)
+    with pytest.raises(RuntimeError):
+        revisions.ingest_revision(COLUMN, 'new_version.csv', replace_original=False)
+    for read_file in saved_files:
+        assert open(read_file).read() == before[read_file]
+
+
+def test_ingest_revision_that_blanks_a_value(raw_df):
+    main_df = pd.read_csv('cleaned_datasets/main_df.csv')
+    code, year = main_df.loc[0, ['code', 'year']]
+    blanked = (raw_df['REF_AREA'] == code) & (raw_df['TIME_PERIOD'] == year)
+    raw_df.loc[blanked, 'OBS_VALUE'] = np.nan
+    raw_df.to_csv('new_version.csv', index=False)
+
+    revisions.ingest_revision(COLUMN, 'new_version.csv', replace_original=False)
+
+    main_df = pd.read_csv('cleaned_datasets/main_df.csv')
+    rebuilt = rebuild_aggregates(main_df, save=False)
+    for group, table in load_aggregates().items():
+        pd.testing.assert_frame_equal(table, rebuilt[group][table.columns], check_exact=False,
+                                      check_dtype=False, rtol=1e-9)
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import scenarios
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _raw_frames():
+    """Raw frames for every source, rebuilt from the cleaned csv files where the raw export is missing"""
+    frames = {}
+    for column, source in scenarios.RAW_SOURCES.items():
+        if os.path.exists(source['read_file']):
+            frames[column] = pd.read_csv(source['read_file'], **source.get('read_kwargs', {}))
+            continue
+        cleaned = pd.read_csv(source['read_file'].replace('original_datasets', 'cleaned_datasets'))
+        raw = pd.DataFrame({'REF_AREA': cleaned['code'], 'Reference area': cleaned['country'],
+                            'TIME_PERIOD': cleaned['year'], 'OBS_VALUE': cleaned[column]})
+        for drop_column in source['drop_columns']:
+            raw[drop_column] = np.nan
+        frames[column] = raw
+    return frames
+
+
+@pytest.fixture
+def raw_frames(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    return _raw_frames()
+
+
+def test_load_raw_sources_names_missing_files(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    missing = [source['read_file'] for source in scenarios.RAW_SOURCES.values()
+               if not os.path.exists(source['read_file'])]
+    if not missing:
+        pytest.skip("every raw export is present")
+    with pytest.raises(FileNotFoundError, match=missing[0]):
+        scenarios.load_raw_sources()
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_run_scenarios_on_given_raw_frames(raw_frames, max_workers):
+    grid = scenarios.scenario_grid(min_year=[2000, 2005], min_years_threshold=[5, 10])
+    outputs, comparison_df = scenarios.run_scenarios(grid, raw_frames=raw_frames, max_workers=max_workers)
+    assert list(comparison_df['name']) == [scenario['name'] for scenario in grid]
+    assert set(outputs) == set(comparison_df['name'])
+    assert (comparison_df['num_rows'] > 0).all()
+    assert scenarios._RAW_FRAMES is None
+
+
+def test_unknown_multipliers_raise(raw_frames):
+    grid = scenarios.scenario_grid(multipliers=['unweighed'])
+    with pytest.raises(ValueError, match="unweighed"):
+        scenarios.run_scenarios(grid, raw_frames=raw_frames, max_workers=1)
@@ -17,6 +17,7 @@ Steps:
     Andorra | 2009 | 10.3
 """
 import pandas as pd
+from key_stats import record_key_stats
 
 
 def drop_cols_with_proportion_na(df: pd.DataFrame, proportion: float = 0.9) -> pd.DataFrame:
@@ -44,7 +45,8 @@ def drop_cols_with_proportion_na(df: pd.DataFrame, proportion: float = 0.9) -> p
 def tidy_informational(df: pd.DataFrame, og_country_column: str = "Reference area", 
                        og_country_code_column: str = "REF_AREA", 
                        og_year_column: str = "TIME_PERIOD",
-                       drop_columns:list[str]=None) -> pd.DataFrame:
+                       drop_columns:list[str]=None, min_year: int = 2000,
+                       max_year: int = 2019, na_proportion: float = 0.9) -> pd.DataFrame:
 
     # drop unneeded columns
     if drop_columns is None:
@@ -61,8 +63,6 @@ def tidy_informational(df: pd.DataFrame, og_country_column: str = "Reference are
     df = df.rename(columns=rename_dict)
 
     # drop all rows not in desried time frame
-    max_year = 2019
-    min_year = 2000
     df = df[(df["year"] <= max_year) & (df["year"] >= min_year)]
 
     # rename columns to be lowercase and replace spaces with underscores
@@ -73,16 +73,18 @@ def tidy_informational(df: pd.DataFrame, og_country_column: str = "Reference are
     rename_dict = dict(zip(all_columns, lower_columns))
     df = df.rename(columns=rename_dict)
 
-    # drop columns with at least 90% NA values
-    df = drop_cols_with_proportion_na(df, 0.9)
+    # drop columns with at least na_proportion (default 90%) NA values
+    df = drop_cols_with_proportion_na(df, na_proportion)
 
     # drop columns that have the not applicable in them
-    not_app_columns = df.columns[(df == "Not applicable").all()]
-    df = df.drop(columns=not_app_columns)
+    # (skipped for empty dataframes, where every column would count as all "Not applicable")
+    if len(df):
+        not_app_columns = df.columns[(df == "Not applicable").all()]
+        df = df.drop(columns=not_app_columns)
 
-    # drop columns that have the not application in them
-    not_application_columns = df.columns[(df == "Not application").all()]
-    df = df.drop(columns=not_application_columns)
+        # drop columns that have the not application in them
+        not_application_columns = df.columns[(df == "Not application").all()]
+        df = df.drop(columns=not_application_columns)
 
     # checking that function successfully changed column names
     assert "country" in df.columns, "no country column found, orginal dataframe columns named differently than expected"
@@ -107,7 +109,9 @@ def sort_by_country_and_year(df:pd.DataFrame) -> pd.DataFrame:
 def tidy(
         df: pd.DataFrame, df_title: str, new_data_cols_map: dict[str],
         og_country_column: str = "Reference area", og_year_column: str = "TIME_PERIOD",
-        drop_columns: list[str] = None, og_country_code_column:str ="REF_AREA",) -> pd.DataFrame:
+        drop_columns: list[str] = None, og_country_code_column:str ="REF_AREA",
+        min_year: int = 2000, max_year: int = 2019, na_proportion: float = 0.9,
+        save: bool = True) -> pd.DataFrame:
     """
     Tidy a dataframe in 2 steps, saving along the way:
         1. get it to an informational state and save in informational_datasets: 
@@ -126,12 +130,16 @@ def tidy(
         - og_year_name: name of the column in the dataframe that contains the years
         - drop_columns: a list of unneccessary columns that should be dropped
             - should not contain columns that would be put in the informational_dataset
+        - min_year, max_year: inclusive range of years to keep
+        - na_proportion: columns with at least this proportion of NA values are dropped
+        - save: whether to save the informational and cleaned dfs to their folders
 
     Returns:
         An updated, tidied dataframe
 
     Side Effects:
-        Saves dfs to informational_datasets and cleaned_datasets
+        Saves dfs to informational_datasets and cleaned_datasets, and records how many rows each
+        (code, year) has (see key_stats.py), if save is True
     """
     df_title = df_title.replace(" ", '_').lower()
     new_data_cols_map = {key: value.replace(" ", "_").lower()
@@ -142,10 +150,16 @@ def tidy(
                             og_country_column=og_country_column, 
                             og_year_column=og_year_column,
                             og_country_code_column=og_country_code_column, 
-                            drop_columns=drop_columns)
-    df.to_csv(f'informational_datasets/{df_title}.csv', index=False)
+                            drop_columns=drop_columns,
+                            min_year=min_year, max_year=max_year,
+                            na_proportion=na_proportion)
+    if save:
+        df.to_csv(f'informational_datasets/{df_title}.csv', index=False)
     df = tidy_numerical(df)
     df = sort_by_country_and_year(df)
-    df.to_csv(f'cleaned_datasets/{df_title}.csv', index=False)
+    if save:
+        df.to_csv(f'cleaned_datasets/{df_title}.csv', index=False)
+        # record how many rows each (code, year) has so merges can be checked before running
+        record_key_stats(df_title, df)
     df = df.reset_index(drop=True)
     return df
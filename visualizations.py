@@ -2,6 +2,7 @@
 import seaborn as sns
 import pandas as pd
 import matplotlib.pyplot as plt
+from aggregates import load_aggregates, get_means, get_variances, get_correlations
 
 
 # ==================================================================================
@@ -26,24 +27,23 @@ def run():
 # FUNCTION DEFINITIONS - no need to comment out
 # =============================================
 
+# correlation between two main_df columns by country, from the precomputed aggregate table
+def country_correlations(column_1, column_2):
+    correlations = get_correlations(load_aggregates()['code'], column_1, column_2)
+    return correlations.reset_index(name='correlation')
+
 _NEG_EXPENDITURE_CORR_CODES = None
 def get_neg_expenditure_corr_codes(correlation_data=None):
     if correlation_data is None:
-        df = pd.read_csv('cleaned_datasets/main_df.csv')
-        correlation_data = df.groupby('code').apply(
-            lambda x: x['health_expenditure_as_percent_gdp'].corr(x['expenditure_per_capita'])
-            ).reset_index(name='correlation')
+        correlation_data = country_correlations('health_expenditure_as_percent_gdp', 'expenditure_per_capita')
     global _NEG_EXPENDITURE_CORR_CODES
     outlier_countries = correlation_data[correlation_data['correlation'] < 0]['code'].to_list()
     _NEG_EXPENDITURE_CORR_CODES = outlier_countries
     return _NEG_EXPENDITURE_CORR_CODES
     
 def med_tech_availability_corr_with_expenditure():
-    df = pd.read_csv('cleaned_datasets/main_df.csv')
-    # get average over all years by country
-    correlation_data = df.groupby('code').apply(
-        lambda x: x['med_tech_availability_p_mil_ppl'].corr(x['expenditure_per_capita'])
-    ).reset_index(name='correlation')
+    # get correlation over all years by country
+    correlation_data = country_correlations('med_tech_availability_p_mil_ppl', 'expenditure_per_capita')
 
     plt.figure(figsize=(10, 6))
     plt.title("Correlation between Med Tech Availability and Expenditure per Capita by Country")
@@ -51,10 +51,7 @@ def med_tech_availability_corr_with_expenditure():
     plt.show()
 
 def health_expenditure_p_capita_vs_health_expenditure_as_perc_gdp():
-    df = pd.read_csv('cleaned_datasets/main_df.csv')
-    correlation_data = df.groupby('code').apply(
-        lambda x: x['health_expenditure_as_percent_gdp'].corr(x['expenditure_per_capita'])
-    ).reset_index(name='correlation')
+    correlation_data = country_correlations('health_expenditure_as_percent_gdp', 'expenditure_per_capita')
 
     plt.figure(figsize=(10, 6))
     plt.title("Correlation between Expenditure as percent of gdp and Expenditure per Capita by Country")
@@ -63,9 +60,7 @@ def health_expenditure_p_capita_vs_health_expenditure_as_perc_gdp():
 
 def analyze_neg_expenditure_correlations():
     df = pd.read_csv('cleaned_datasets/main_df.csv')
-    correlation_data = df.groupby('code').apply(
-        lambda x: x['health_expenditure_as_percent_gdp'].corr(x['expenditure_per_capita'])
-    ).reset_index(name='correlation')
+    correlation_data = country_correlations('health_expenditure_as_percent_gdp', 'expenditure_per_capita')
     outlier_countries = get_neg_expenditure_corr_codes(correlation_data)
     df_outliers = df[df['code'].isin(outlier_countries)]
     
@@ -107,9 +102,7 @@ def death_by_country_over_time():
 #hospital stay length by med tech avalibity
 def hospital_stay_length_by_med_tech_avalibility_over_time():
     df = pd.read_csv("cleaned_datasets/main_df.csv")
-    correlation_data = df.groupby('code').apply(
-        lambda x: x['hospital_stay_length'].corr(x['med_tech_availability_p_mil_ppl'])
-    ).reset_index(name='correlation')
+    correlation_data = country_correlations('hospital_stay_length', 'med_tech_availability_p_mil_ppl')
     print(correlation_data)
     fig = sns.scatterplot(y = "code", x = "correlation", palette = "viridis", data =df)
     plt.xticks(range(0,7000,500))
@@ -120,8 +113,14 @@ def hospital_stay_length_by_med_tech_avalibility_over_time():
 
 # expenditure per capita by country (mean over the years)
 def expenditure_per_capita_by_country():
-    df = pd.read_csv("cleaned_datasets/main_df.csv")
-    sns.barplot(data = df, x = 'code', y = 'expenditure_per_capita');
+    by_code = load_aggregates()['code']
+    means = get_means(by_code).reset_index()
+    # 95% confidence interval of the mean over the years, like seaborn's default error bars
+    sds = get_variances(by_code)['expenditure_per_capita'] ** 0.5
+    ci = 1.96 * sds / by_code['count_expenditure_per_capita'] ** 0.5
+    sns.barplot(data = means, x = 'code', y = 'expenditure_per_capita');
+    plt.errorbar(x = range(len(means)), y = means['expenditure_per_capita'], yerr = ci.to_numpy(),
+                 fmt = 'none', ecolor = 'black');
     plt.xticks(rotation=75)
     plt.tight_layout()
     plt.show()